@@ -3,6 +3,7 @@ import matplotlib
 import numpy as np
 import pandas as pd
 from effectiveness.classification.plots import go, py
+from effectiveness.resources import nested_allotment
 from effectiveness.settings import DATA_DIR
 from matplotlib import pyplot as plt
 from sklearn.ensemble import RandomForestClassifier
@@ -179,6 +180,9 @@ def classification(
     inner_cv = StratifiedKFold(n_splits=n_inner, shuffle=True)
     outer_cv = RepeatedStratifiedKFold(n_splits=n_outer, n_repeats=n_repeats)
 
+    # the outer folds run in parallel, each one with its share of the cores for the grid search
+    allotment = nested_allotment(n_outer * n_repeats)
+
     # inner cross validation
     grid = GridSearchCV(
         estimator=pipe,
@@ -188,7 +192,7 @@ def classification(
         refit='roc_auc_scorer',
         return_train_score=True,
         verbose=1,
-        n_jobs=-1,
+        n_jobs=allotment.threads,
     )
 
     results = cross_validate(
@@ -199,7 +203,7 @@ def classification(
         scoring=get_scoring(),
         return_train_score=True,
         verbose=1,
-        n_jobs=-1,
+        n_jobs=allotment.workers,
     )
 
     accuracy = results.get('test_accuracy').mean()
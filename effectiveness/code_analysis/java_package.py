@@ -0,0 +1,109 @@
+"""Package declarations of Java files, read once per version of a file.
+
+Only the beginning of a file is read: the `package` statement can only be preceded
+by comments (e.g. license headers) and, in `package-info.java`, annotations.
+Packages are kept in a SQLite database keyed on path, size and modification time,
+so scanning an unchanged tree again only needs a `stat` of every file.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from effectiveness import settings
+
+# bytes read at first, enough for all but the longest license headers
+PREFIX_SIZE = 16 * 1024
+
+COMMENT = re.compile(r"/\*.*?\*/|//[^\n]*", re.DOTALL)
+HEADER = re.compile(
+    r"\s*(?:@\s*[\w.]+\s*(?:\([^)]*\))?\s*)*package\s+(?P<package>[\w.\s]+?)\s*;"
+)
+# a block comment still open at the end of what was read
+UNTERMINATED_COMMENT = re.compile(r"/\*(?:(?!\*/).)*\Z", re.DOTALL)
+
+
+def parse_package(text: str) -> Optional[str]:
+    """Package declared by the source, None for the default package"""
+    match = HEADER.match(COMMENT.sub(' ', text))
+    return re.sub(r"\s+", "", match['package']) if match else None
+
+
+def read_package(path: Path) -> Optional[str]:
+    try:
+        with open(path, 'rb') as source:
+            text = source.read(PREFIX_SIZE).decode('utf-8-sig', errors='ignore')
+            if UNTERMINATED_COMMENT.search(COMMENT.sub(' ', text)):
+                # the header doesn't end in the prefix
+                text += source.read().decode('utf-8', errors='ignore')
+    except OSError:
+        return None
+    return parse_package(text)
+
+
+class PackageCache:
+    def __init__(self, path: Path = settings.JAVA_PACKAGE_CACHE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        with self._lock, self._connection as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS packages (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    package TEXT
+                )
+                """
+            )
+
+    def package(self, path: Path) -> Optional[str]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT package FROM packages WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (key, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row is not None:
+            return row[0]
+
+        package = read_package(path)
+        with self._lock, self._connection as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO packages (path, size, mtime_ns, package) "
+                "VALUES (?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime_ns, package),
+            )
+        return package
+
+
+# by process id, as SQLite connections can't be used by forked workers
+_caches: Dict[int, PackageCache] = {}
+_caches_lock = threading.Lock()
+
+
+def package_cache() -> PackageCache:
+    with _caches_lock:
+        pid = os.getpid()
+        if pid not in _caches:
+            _caches[pid] = PackageCache()
+        return _caches[pid]
+
+
+def qualified_name(path: Path) -> Optional[str]:
+    """Fully qualified name of the top level class of a source file,
+    None if it's in the default package
+    """
+    package = package_cache().package(path)
+    return None if package is None else f"{package}.{Path(path).stem}"
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-import fnmatch
-import glob
 import os
 import re
+from collections import defaultdict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+from effectiveness.code_analysis.java_package import qualified_name
 
 
 @dataclass
@@ -21,33 +22,46 @@ class PomModule:
             p.replace(".class", ".java") for p in self.include_patterns
         ]
 
-    def find_cut_pairs(self, test_subdir: Path, src_subdir: Path) -> Iterable[CutPair]:
+    def find_cut_pairs(self, test_subdir: Path, src_subdir: Path) -> List[CutPair]:
         tests = self.find_tests(test_subdir)
-        return self.find_cuts(tests, src_subdir)
+        return unique_pairs(self.find_cuts(tests, src_subdir))
 
     def find_tests(self, test_subdir: Path) -> Iterable[Tuple[Path, str, str]]:
-        excluded = {
-            file
-            for exclude in self.exclude_patterns
-            for file in test_subdir.glob(exclude)
-        }
-        for include in self.include_patterns:
-            for test_file in test_subdir.glob(include):
-                if test_file not in excluded:
+        """Test files matching an include pattern and no exclude pattern, in a single walk
+
+        A file matching several include patterns is listed once for every pattern,
+        as each of them may point to a different CUT.
+        """
+        includes = [(include, compile_glob(include)) for include in self.include_patterns]
+        excludes = [compile_glob(exclude) for exclude in self.exclude_patterns]
+        for relative_path, test_file in walk_files(test_subdir):
+            if any(exclude.match(relative_path) for exclude in excludes):
+                continue
+            for include, matcher in includes:
+                if matcher.match(relative_path):
                     yield test_file, self.get_full_qualified_name(test_file), include
 
     def find_cuts(
         self, tests: Iterable[Tuple[Path, str, str]], src_subdir: Path
     ) -> Iterable[CutPair]:
+        index = SourceIndex(src_subdir)
         for test_path, test_qualified_name, include_pattern in tests:
             source_file_name = self.get_cut_name(test_path, include_pattern)
-            for source_path in src_subdir.rglob(source_file_name):
-                yield CutPair(
-                    test_path,
-                    test_qualified_name,
-                    source_path,
-                    self.get_full_qualified_name(source_path),
-                )
+            # most CUTs are in the package of their test, no need to look at the others
+            package = '.'.join(package_of(test_qualified_name))
+            same_package = f"{package}.{Path(source_file_name).stem}"
+            source_path = index.find(same_package) if package else None
+            if source_path is not None:
+                candidates = [(source_path, same_package)]
+            else:
+                candidates = [
+                    (source_path, index.qualified_name(source_path))
+                    for source_path in index.paths(source_file_name)
+                ]
+            for source_path, source_qualified_name in closest_cuts(
+                test_qualified_name, candidates
+            ):
+                yield CutPair(test_path, test_qualified_name, source_path, source_qualified_name)
 
     @staticmethod
     def get_cut_name(test_path: Path, include_pattern: str) -> str:
@@ -76,13 +90,103 @@ class PomModule:
             return test_path.name
 
     @staticmethod
-    def get_full_qualified_name(path: Path) -> str:
-        with open(path, encoding="utf8", errors='ignore') as f:
-            for line in f:
-                if line.startswith('package'):
-                    package = line.replace('package', '').strip().strip(';')
-                    name = path.stem
-                    return f"{package}.{name}"
+    def get_full_qualified_name(path: Path) -> Optional[str]:
+        return qualified_name(path)
+
+
+def compile_glob(pattern: str) -> Pattern[str]:
+    """Regular expression matching the relative paths that `Path.glob(pattern)` finds"""
+    parts = []
+    for token in re.split(r"(\*\*/|\*\*|\*|\?)", pattern.strip('/')):
+        if token == '**/':
+            parts.append('(?:.*/)?')
+        elif token == '**':
+            parts.append('.*')
+        elif token == '*':
+            parts.append('[^/]*')
+        elif token == '?':
+            parts.append('[^/]')
+        else:
+            parts.append(re.escape(token))
+    return re.compile(''.join(parts) + r'\Z')
+
+
+def walk_files(root: Path) -> Iterator[Tuple[str, Path]]:
+    """Every file under `root` with its `/`-separated relative path, from one `os.scandir` walk"""
+    stack = [('', root)]
+    while stack:
+        prefix, directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append((f"{prefix}{entry.name}/", Path(entry.path)))
+            elif entry.is_file():
+                yield f"{prefix}{entry.name}", Path(entry.path)
+
+
+class SourceIndex:
+    """Java files of a source root by file name, from a single walk of the directory"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._by_name: Dict[str, List[Path]] = defaultdict(list)
+        self._qualified_names: Dict[Path, Optional[str]] = {}
+        for _, path in walk_files(root):
+            if path.suffix == '.java':
+                self._by_name[path.name].append(path)
+
+    def paths(self, file_name: str) -> List[Path]:
+        return self._by_name.get(file_name, [])
+
+    def qualified_name(self, path: Path) -> Optional[str]:
+        if path not in self._qualified_names:
+            self._qualified_names[path] = PomModule.get_full_qualified_name(path)
+        return self._qualified_names[path]
+
+    def find(self, qualified_name: str) -> Optional[Path]:
+        """Source file of a class, None if it's not in this root"""
+        file_name = f"{qualified_name.rsplit('.', 1)[-1]}.java"
+        return next(
+            (path for path in self.paths(file_name) if self.qualified_name(path) == qualified_name),
+            None,
+        )
+
+
+def package_of(qualified_name: Optional[str]) -> List[str]:
+    if not qualified_name:
+        return []
+    return qualified_name.split('.')[:-1]
+
+
+def closest_cuts(
+    test_qualified_name: str, candidates: List[Tuple[Path, str]]
+) -> List[Tuple[Path, str]]:
+    """Classes with the name of the CUT whose package is the closest to the test's
+
+    A CUT in the same package as the test wins over classes with the same name
+    elsewhere in the module; with none there, the ones sharing the longest package prefix
+    (and then nested the least below it) are kept, all of them if they tie.
+    """
+    if len(candidates) < 2:
+        return candidates
+
+    test_package = package_of(test_qualified_name)
+
+    def closeness(candidate: Tuple[Path, str]) -> Tuple[int, int]:
+        cut_package = package_of(candidate[1])
+        shared = 0
+        for test_part, cut_part in zip(test_package, cut_package):
+            if test_part != cut_part:
+                break
+            shared += 1
+        return shared, shared - len(cut_package)
+
+    best = max(map(closeness, candidates))
+    return [candidate for candidate in candidates if closeness(candidate) == best]
 
 
 @dataclass
@@ -91,3 +195,18 @@ class CutPair:
     test_qualified_name: str
     source_path: Path
     source_qualified_name: str
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.test_qualified_name, self.source_qualified_name
+
+
+def unique_pairs(pairs: Iterable[CutPair]) -> List[CutPair]:
+    """The first pair of every (test, CUT), so that no pair is mutated twice"""
+    seen = set()
+    unique = []
+    for pair in pairs:
+        if pair.key not in seen:
+            seen.add(pair.key)
+            unique.append(pair)
+    return unique
@@ -1,15 +1,18 @@
 import logging
-import re
+import shutil
 import subprocess
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 
 import pandas as pd
 from effectiveness.code_analysis.get_commit import get_last_commit_id
-from effectiveness.code_analysis.pom_module import CutPair, PomModule
-from effectiveness.pom_utils import ET, POM_NSMAP
+from effectiveness.code_analysis.pom_module import CutPair, PomModule, unique_pairs
+from effectiveness.pom_model import SUREFIRE_PLUGIN, PomModel
+from effectiveness.resources import cpu_budget
 from effectiveness.settings import SCAN_PROJECT_DIR, TSDETECT_DIR, TSDETECT_JAR
+from effectiveness.utils import atomic_path, locked
 
 special_cases = {
     'core': ('/src/', '/test/'),
@@ -38,14 +41,7 @@ def get_submodules(project_path: Path) -> List[str]:
     """
     pom_path = project_path / 'pom.xml'
     assert pom_path.exists()
-    pom_parsed = ET.parse(pom_path)
-    modules = pom_parsed.find('pom:modules', POM_NSMAP)
-    modules_list = []
-    if modules:
-        for module in modules.findall('pom:module', POM_NSMAP):
-            detected_module = module.text
-            if 'xml' not in detected_module:
-                modules_list.append(detected_module)
+    modules_list = [module for module in PomModel.load(pom_path).modules if 'xml' not in module]
     logging.info(f'Found {len(modules_list)} module(s):\n', modules_list)
 
     return filter_submodule_exceptions(project_path.name, modules_list)
@@ -55,27 +51,37 @@ def search_project_tests(project_path: Path, results_dir=SCAN_PROJECT_DIR):
     submodules = get_submodules(project_path)
 
     if submodules:
-        submodule_cuts = {}
-        for submodule in submodules:
-            submodule_path = project_path / submodule
-            cuts = search_module_tests(
-                project_path,
-                project_path.name,
-                submodule_path,
-                submodule,
-                results_dir=results_dir,
-            )
-            submodule_cuts[submodule] = cuts
+        # modules are scanned independently, each in its own process
+        with ProcessPoolExecutor(min(len(submodules), cpu_budget())) as executor:
+            futures = {
+                submodule: executor.submit(
+                    search_module_tests,
+                    project_path,
+                    project_path.name,
+                    project_path / submodule,
+                    submodule,
+                    results_dir=results_dir,
+                )
+                for submodule in submodules
+            }
+            submodule_cuts = {submodule: future.result() for submodule, future in futures.items()}
 
         total_tests = sum(len(cuts) for cuts in submodule_cuts.values())
         print(f"Total tests for {project_path.name}: {total_tests}")
         for submodule, cuts in submodule_cuts.items():
             print(f"   - {submodule}: {len(cuts)}")
+        test_pairs = [pair for cuts in submodule_cuts.values() for pair in cuts]
     else:
-        search_module_tests(
+        test_pairs = search_module_tests(
             project_path, project_path.name, project_path, results_dir=results_dir
         )
 
+    # TODO: move to separate file
+    # a single TsDetect run with the pairs of all the modules
+    pairs_to_tsdetect_csv(test_pairs, project_path.name, results_dir)
+    tsdetect_analyze_project(project_path.name, input_dir=results_dir)
+    merge_tsdetect_files(project_path.name)
+
 
 def search_module_tests(
     project_path: Path,
@@ -99,38 +105,22 @@ def search_module_tests(
 
     print(f"* * Found pom: {pom}")
 
-    tree = ET.parse(pom)
-    root = tree.getroot()
-
-    include_patterns = []
-    exclude_patterns = []
-
-    surefire_plugin = root.find(
-        ".//pom:plugin/[pom:artifactId='maven-surefire-plugin']", POM_NSMAP
-    )
-    if surefire_plugin is None:
-        if module_path != project_path:
-            print("* * * Couldn't find maven-surefire-plugin in pom")
-            print("* * * Searching parent pom")
-            parent_pom = project_path / 'pom.xml'
-            if parent_pom.exists():
-                print(f"* * * Found parent pom: {parent_pom}")
-                surefire_plugin = (
-                    ET.parse(parent_pom)
-                    .getroot()
-                    .find(".//pom:plugin/[pom:artifactId='maven-surefire-plugin']", POM_NSMAP)
-                )
-
-    if surefire_plugin is None:
+    # the plugin may be declared in the module or inherited from its parents
+    model = PomModel.load(pom)
+    if model.plugin(SUREFIRE_PLUGIN) is None and module_path != project_path:
+        print("* * * Couldn't find maven-surefire-plugin in pom or its parents")
+        print("* * * Searching project pom")
+        parent_pom = project_path / 'pom.xml'
+        if parent_pom.exists():
+            print(f"* * * Found project pom: {parent_pom}")
+            model = PomModel.load(parent_pom)
+
+    if model.plugin(SUREFIRE_PLUGIN) is None:
         print("* * * Couldn't find maven-surefire-plugin in any pom")
     else:
         print("* * maven-surefire-plugin found")
-        includes = surefire_plugin.findall('.//pom:include', POM_NSMAP)
-        for include in includes:
-            include_patterns.append(include.text)
-        excludes = surefire_plugin.findall('.//pom:exclude', POM_NSMAP)
-        for exclude in excludes:
-            exclude_patterns.append(exclude.text)
+    include_patterns = model.surefire_includes
+    exclude_patterns = model.surefire_excludes
 
     DEFAULT_INCLUDES = [
         "**/*Test.java",
@@ -175,18 +165,12 @@ def search_module_tests(
     print("* * Main path:", main_path)
     print("* * Tests path:", tests_path)
 
-    # TODO: remove duplicate test entries
-    test_pairs = list(module.find_cut_pairs(tests_path, main_path))
+    test_pairs = module.find_cut_pairs(tests_path, main_path)
 
     print(f"* *  -  {full_name}: Found {len(test_pairs)} class-test pairs")
 
     cut_pairs_to_csv(test_pairs, module_path, module, results_dir)
 
-    # TODO: move to separate file
-    pairs_to_tsdetect_csv(test_pairs, project_name, results_dir)
-    tsdetect_analyze_project(project_name, input_dir=results_dir)
-    merge_tsdetect_files()
-
     return test_pairs
 
 
@@ -233,18 +217,39 @@ def pairs_to_tsdetect_csv(
 
 
 def merge_tsdetect_files(
-    *, input_dir: Path = TSDETECT_DIR / "projects", output_dir: Path = TSDETECT_DIR
+    project_name: Optional[str] = None,
+    *,
+    input_dir: Path = TSDETECT_DIR / "projects",
+    output_dir: Path = TSDETECT_DIR,
 ):
-    print(f"* * Merging tsDetect csvs in {input_dir}")
+    """Merges the TsDetect outputs of the projects into `test-smells.csv`
 
-    all_files = input_dir.glob("TsDetect_*.csv")
+    The file is locked while it's read and replaced, so that concurrent scans
+    of different projects don't drop each other's rows.
 
-    frame = pd.concat(
-        map(pd.read_csv, all_files),
-        ignore_index=True,
-    )
+    :param project_name: replace only the rows of this project, rebuild from all outputs if None
+    """
     output_file = output_dir / "test-smells.csv"
-    frame.to_csv(output_file, index=False)
+    with locked(output_file):
+        if project_name is not None and output_file.exists():
+            print(f"* * Merging tsDetect csv of {project_name}")
+            merged = pd.read_csv(output_file)
+            frame = pd.concat(
+                [
+                    merged[merged["App"] != project_name],
+                    pd.read_csv(input_dir / f"TsDetect_{project_name}.csv"),
+                ],
+                ignore_index=True,
+            )
+        else:
+            print(f"* * Merging tsDetect csvs in {input_dir}")
+            frame = pd.concat(
+                map(pd.read_csv, input_dir.glob("TsDetect_*.csv")),
+                ignore_index=True,
+            )
+
+        with atomic_path(output_file) as tmp_file:
+            frame.to_csv(tmp_file, index=False)
     print(f"* * Done merging to {output_file}")
 
 
@@ -281,17 +286,17 @@ def cut_pairs_to_csv(
     output = output / module.project_name / last_commit
     output.mkdir(exist_ok=True, parents=True)
     if not latest.is_symlink() and latest.is_dir():
-        import shutil
-
-        shutil.rmtree(latest)
-    latest.unlink(missing_ok=True)
-    latest.symlink_to(output.relative_to(latest.parent), target_is_directory=True)
+        shutil.rmtree(latest, ignore_errors=True)
+    # modules are scanned concurrently: swap the link in one rename instead of unlink + create
+    with atomic_path(latest) as tmp_latest:
+        tmp_latest.symlink_to(output.relative_to(latest.parent), target_is_directory=True)
 
     filename = f"tests_{module.name or module.project_name}.csv"
 
     print("* * Saving CUTs to", output / filename)
-    frame.to_csv(old_output, index=False)
-    frame.to_csv(output / filename, index=False)
+    for path in (old_output, output / filename):
+        with atomic_path(path) as tmp_path:
+            frame.to_csv(tmp_path, index=False)
 
 
 def load_cut_pairs(path: Path) -> Optional[Tuple[str, str, List[CutPair]]]:
@@ -311,16 +316,18 @@ def load_cut_pairs(path: Path) -> Optional[Tuple[str, str, List[CutPair]]]:
     module = data["module"].fillna('').unique()
     assert len(module) == 1, f"{path} should contain data for one module"
 
-    return (
-        project[0],
-        module[0],
-        [
-            CutPair(test_path, test_qualified_name, source_path, source_qualified_name)
-            for test_path, test_qualified_name, source_path, source_qualified_name in data[
-                ["test_path", "test_name", "class_path", "class_name"]
-            ].itertuples(index=False)
-        ],
-    )
+    cut_tests = [
+        CutPair(test_path, test_qualified_name, source_path, source_qualified_name)
+        for test_path, test_qualified_name, source_path, source_qualified_name in data[
+            ["test_path", "test_name", "class_path", "class_name"]
+        ].itertuples(index=False)
+    ]
+    # files written before the scan removed duplicates
+    unique = unique_pairs(cut_tests)
+    if len(unique) < len(cut_tests):
+        print(f"* * Dropped {len(cut_tests) - len(unique)} duplicate pairs from {path}")
+
+    return project[0], module[0], unique
 
 
 def get_source_directories(
@@ -333,11 +340,13 @@ def get_source_directories(
     except KeyError:
         pass
 
-    pom_paths = list(module_path.glob('pom*.xml'))
+    models = [PomModel.load(pom) for pom in module_path.glob('pom*.xml')]
 
-    override_source = look_for_tag(pom_paths, 'sourceDirectory', direct_children_of="build")
-    override_test_source = look_for_tag(
-        pom_paths, 'testSourceDirectory', direct_children_of="build"
+    override_source = next(
+        (model.source_directory for model in models if model.source_directory), None
+    )
+    override_test_source = next(
+        (model.test_source_directory for model in models if model.test_source_directory), None
     )
 
     # check the test dir and the source dir
@@ -350,24 +359,6 @@ def get_source_directories(
     return src_dir, test_dir
 
 
-def look_for_tag(
-    poms: List[Path], tag: str, *, children_of: str = None, direct_children_of: str = None
-) -> Optional[str]:
-    """Return string content of a tag in one of the supplied poms"""
-    for pom in poms:
-        pom = ET.parse(pom).getroot()
-        if children_of:
-            pattern = f".//pom:{children_of}//pom:{tag}"
-        elif direct_children_of:
-            pattern = f".//pom:{direct_children_of}/pom:{tag}"
-        else:
-            pattern = f".//pom:{tag}"
-        element = pom.find(pattern, POM_NSMAP)
-        if element is not None:
-            return re.sub("[$@*}?].*[$@*}?]", "", element.text)
-    return None
-
-
 if __name__ == '__main__':
 
     def main():
@@ -0,0 +1,254 @@
+"""Running Maven goals, on a warm daemon when one is available."""
+
+import asyncio
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, List, NamedTuple, Optional, Pattern, Sequence, Tuple
+
+from effectiveness import settings
+
+
+class ProcessUsage(NamedTuple):
+    # seconds
+    wall_time: float
+    # user and system seconds of the process and of the children it waited for
+    cpu_time: float
+    # bytes, of the largest of those processes
+    max_rss: int
+    # e.g. "exit 1", "signal 9", "timeout", "fatal output"
+    exit_reason: str
+    output_bytes: int
+
+
+UsageCallback = Callable[[ProcessUsage], None]
+
+
+class StreamedRun(NamedTuple):
+    returncode: Optional[int]
+    # the output line that made the build stop early
+    fatal_line: Optional[str] = None
+    timed_out: bool = False
+    usage: Optional[ProcessUsage] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and self.fatal_line is None and not self.timed_out
+
+
+def _wait(pid: int) -> Tuple[int, resource.struct_rusage]:
+    """Reaps the process, with the resources it used"""
+    _, status, rusage = os.wait4(pid, 0)
+    # negative signal numbers like `Popen.returncode`, os.waitstatus_to_exitcode needs Python 3.9
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status), rusage
+    return os.WEXITSTATUS(status), rusage
+
+
+def _usage(
+    started: float,
+    returncode: int,
+    rusage: resource.struct_rusage,
+    output_bytes: int,
+    exit_reason: Optional[str] = None,
+) -> ProcessUsage:
+    if exit_reason is None:
+        exit_reason = f"exit {returncode}" if returncode >= 0 else f"signal {-returncode}"
+    return ProcessUsage(
+        wall_time=time.monotonic() - started,
+        cpu_time=rusage.ru_utime + rusage.ru_stime,
+        # kilobytes on Linux
+        max_rss=rusage.ru_maxrss * 1024,
+        exit_reason=exit_reason,
+        output_bytes=output_bytes,
+    )
+
+
+def _kill_process_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def _stream(
+    command: List, cwd: Path, timeout: Optional[float], fatal: Optional[Pattern], log: Deque[str]
+) -> StreamedRun:
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    # a session of its own, so that the forked JVMs (e.g. PIT minions) are killed too
+    process = subprocess.Popen(
+        list(map(str, command)),
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    reader = asyncio.StreamReader(limit=2**20)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), process.stdout
+    )
+    output_bytes = 0
+
+    async def read_line() -> bytes:
+        try:
+            return await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            # end of the output, without a last newline
+            return e.partial
+        except asyncio.LimitOverrunError as e:
+            # a line longer than the buffer, handed out in pieces
+            return await reader.read(e.consumed)
+
+    async def read_until_fatal() -> Optional[str]:
+        nonlocal output_bytes
+        while True:
+            line = await read_line()
+            if not line:
+                return None
+            output_bytes += len(line)
+            text = line.decode(errors='replace').rstrip()
+            log.append(text)
+            if fatal is not None and fatal.search(text):
+                return text
+
+    fatal_line, exit_reason = None, None
+    read = False
+    try:
+        fatal_line = await asyncio.wait_for(read_until_fatal(), timeout)
+        if fatal_line is not None:
+            exit_reason = "fatal output"
+        read = True
+    except asyncio.TimeoutError:
+        exit_reason = "timeout"
+        read = True
+    finally:
+        if exit_reason is not None or not read:
+            _kill_process_group(process.pid)
+        transport.close()
+        if not read:
+            # reading failed or was interrupted, the build mustn't be left running unreaped
+            process.returncode, _ = _wait(process.pid)
+
+    # reaped here rather than by asyncio, to get the resources it used
+    returncode, rusage = await loop.run_in_executor(None, _wait, process.pid)
+    process.returncode = returncode
+    return StreamedRun(
+        returncode,
+        fatal_line,
+        timed_out=exit_reason == "timeout",
+        usage=_usage(started, returncode, rusage, output_bytes, exit_reason),
+    )
+
+
+class MavenExecutor:
+    """Runs a Maven command line with the semantics of `subprocess.run`
+
+    The default implementation starts a new (cold) JVM for every command.
+    """
+
+    name = "mvn"
+
+    def command(self, args: Sequence) -> List:
+        return [self.name, *args]
+
+    def run(
+        self,
+        args: Sequence,
+        *,
+        cwd: Path,
+        log_file: Optional[Path] = None,
+        timeout: Optional[float] = None,
+        check: bool = False,
+        on_usage: Optional[UsageCallback] = None,
+    ) -> subprocess.CompletedProcess:
+        """
+        :param args: goals and options, without the executable
+        :param log_file: where the build output goes, the console if None
+        :param on_usage: called with the resources used by the build, even if it fails
+        """
+        if log_file is not None:
+            args = [*args, "--log-file", log_file]
+        command = self.command(args)
+
+        started = time.monotonic()
+        process = subprocess.Popen(command, cwd=cwd)
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, expire) if timeout is not None else None
+        if timer is not None:
+            timer.start()
+        try:
+            returncode, rusage = _wait(process.pid)
+        finally:
+            if timer is not None:
+                timer.cancel()
+        process.returncode = returncode
+
+        if on_usage is not None:
+            output_bytes = log_file.stat().st_size if log_file and log_file.exists() else 0
+            exit_reason = "timeout" if expired.is_set() else None
+            on_usage(_usage(started, returncode, rusage, output_bytes, exit_reason))
+        if expired.is_set():
+            raise subprocess.TimeoutExpired(command, timeout)
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command)
+        return subprocess.CompletedProcess(command, returncode)
+
+    def stream(
+        self,
+        args: Sequence,
+        *,
+        cwd: Path,
+        log_file: Optional[Path] = None,
+        timeout: Optional[float] = None,
+        fatal: Optional[Pattern] = None,
+        log_lines: int = settings.MAVEN_LOG_LINES,
+        on_usage: Optional[UsageCallback] = None,
+    ) -> StreamedRun:
+        """Runs the command reading its output line by line,
+        and kills it as soon as a line matches `fatal`
+
+        Only the last `log_lines` lines are kept, and written to `log_file`
+        only if the run didn't succeed.
+        """
+        log: Deque[str] = deque(maxlen=log_lines)
+        result = asyncio.run(_stream(self.command(args), cwd, timeout, fatal, log))
+        if on_usage is not None:
+            on_usage(result.usage)
+        if not result.ok and log_file is not None:
+            log_file.parent.mkdir(parents=True, exist_ok=True)
+            log_file.write_text("\n".join(log) + "\n")
+        return result
+
+
+class DaemonMavenExecutor(MavenExecutor):
+    """Sends the goals to the long-lived JVMs of the Maven Daemon (`mvnd`)
+
+    The daemons keep Maven, its plugins and the contents of `~/.m2` loaded,
+    so only the first build pays for bootstrapping.
+    Killing the client on timeout makes the daemon cancel the build.
+    """
+
+    name = "mvnd"
+
+    def command(self, args: Sequence) -> List:
+        # plain output, as the daemon would otherwise render a progress screen
+        return [self.name, "--batch-mode", *args]
+
+
+def get_maven_executor(use_daemon: bool = settings.MAVEN_DAEMON) -> MavenExecutor:
+    """The daemon executor if requested and installed, cold `mvn` otherwise"""
+    if use_daemon and shutil.which(DaemonMavenExecutor.name):
+        return DaemonMavenExecutor()
+    return MavenExecutor()
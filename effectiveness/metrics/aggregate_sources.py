@@ -37,6 +37,12 @@ def process_results(
     mutation_frame = pd.read_csv(mutation)
     print("* Number of originally executed mutations = {}".format(len(mutation_frame)))
     mutation_frame = mutation_frame.dropna(subset=['mutation_score', 'line_coverage'])
+    if 'mutation_score_ci_low' not in mutation_frame:
+        # reports from before sampled runs, all exact
+        position = mutation_frame.columns.get_loc('line_coverage')
+        score = mutation_frame['mutation_score']
+        mutation_frame.insert(position, 'mutation_score_ci_low', score)
+        mutation_frame.insert(position + 1, 'mutation_score_ci_high', score)
     print("* Number of successfull mutations = {}".format(len(mutation_frame)))
     filtered_frame: pd.DataFrame = mutation_frame
 
@@ -1,8 +1,9 @@
 import shutil
-import subprocess
 from pathlib import Path
 from xml.dom import minidom
 
+from effectiveness.maven import get_maven_executor
+from effectiveness.pom_model import PomModel
 from effectiveness.pom_utils import ET, POM_NSMAP, indent, obj_to_xml
 from effectiveness.settings import CHECKSTYLE_PLUGIN_VERSION, PROJECTS_DIR
 
@@ -26,8 +27,8 @@ def calculate_metrics(project: str):
         # Add plugin to pom.xml
         add_checkstyle_plugin(cached_pom, pom, configuration_file_name)
 
-        subprocess.run(
-            ["mvn", "site"],
+        get_maven_executor().run(
+            ["site"],
             cwd=project_directory,
             # timeout=settings.MUTATION_TIMEOUT,
             # check=True,
@@ -78,7 +79,7 @@ def create_configuration_file(project_directory: Path, configuration_file_name:
 
 
 def add_checkstyle_plugin(pom: Path, target: Path, configuration_file_name: str):
-    pom = ET.parse(pom)
+    pom = PomModel.load(pom).copy_tree()
     root = pom.getroot()
     plugins_element = pom.find("./pom:reporting/pom:plugins", POM_NSMAP)
 
@@ -0,0 +1,64 @@
+"""Persistent cache of mutation reports.
+
+A report is reused when the CUT source, the test source, the mutation operators
+and the PIT version are all the same as in the run that produced it.
+Entries share the files of the reports they come from through hardlinks.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from effectiveness import settings
+from effectiveness.code_analysis.pom_module import CutPair
+from effectiveness.mutation.report_store import link_tree
+from effectiveness.mutation.utils import expand_operator
+
+
+class MutationCache:
+    def __init__(self, root: Path = settings.MUTATION_CACHE_DIR):
+        self.root = root
+
+    @staticmethod
+    def key(pair: CutPair, operator: str, *variant: str) -> str:
+        """
+        :param variant: anything else changing the report, e.g. its output formats
+        """
+        digest = hashlib.sha256()
+        for source in (pair.source_path, pair.test_path):
+            digest.update(Path(source).read_bytes())
+            digest.update(b"\0")
+        digest.update(",".join(sorted(expand_operator(operator))).encode())
+        digest.update(b"\0")
+        digest.update(settings.PIT_VERSION.encode())
+        for part in variant:
+            digest.update(b"\0")
+            digest.update(part.encode())
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[Path]:
+        entry = self._entry(key)
+        return entry if entry.is_dir() else None
+
+    def store(self, key: str, report_dir: Path):
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # link next to the entry and rename, so readers never see a partial report
+        tmp_dir = Path(tempfile.mkdtemp(dir=entry.parent, prefix=f".{key}."))
+        try:
+            link_tree(report_dir, tmp_dir)
+            try:
+                os.replace(tmp_dir, entry)
+            except OSError:
+                # the same report has been stored by another worker in the meantime
+                if not entry.is_dir():
+                    raise
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir)
@@ -1,8 +1,14 @@
+import argparse
 import os
 from typing import Optional
 
 import pandas as pd
 from effectiveness.mutation.pitest_html_parser import ParserOutput, PitestHTMLParser
+from effectiveness.mutation.mutators import operators_of_group
+from effectiveness.mutation.pitest_xml_parser import PitestXMLParser
+from effectiveness.mutation.report_store import open_latest
+from effectiveness.mutation.sampling import read_sampling_report
+from effectiveness.mutation.utils import listed_operator
 from effectiveness.settings import (
     ALL_OPERATORS,
     METRICS_DIR,
@@ -19,20 +25,54 @@ def prepare_results(
     mutation_results_dir=MUTATION_RESULTS_DIR,
     cuts_dir=SCAN_PROJECT_DIR,
     clean=True,
+    derive_from: Optional[str] = None,
 ):
-    """Aggregates mutation results into one data frame"""
+    """Aggregates mutation results into one data frame
+
+    :param derive_from: the operator of a run made with `run.py --derivable`,
+        whose mutants are filtered to score `operator`, instead of a run of `operator` itself.
+        The scores of a group are saved as `<group>_LISTED`, they only have the operators
+        listed in `settings.OPERATORS`, not all the mutators of PIT's group
+    """
 
     cut_files = cuts_dir.glob('*/latest/tests_*.csv')
     aggregate = pd.concat(map(pd.read_csv, cut_files))
 
     aggregate['module'].fillna('', inplace=True)
 
+    if derive_from:
+        parse = lambda row: parse_derived_report(row, operator, derive_from, mutation_results_dir)
+    else:
+        parse = lambda row: parse_html_report(row, operator, mutation_results_dir)
+
     report_data = aggregate.apply(
-        lambda row: tuple_if_none(parse_html_report(row, operator, mutation_results_dir), 3),
+        lambda row: tuple_if_none(parse(row), 5),
         axis=1,
         result_type='expand',
     )
-    aggregate[["total_mutations", "mutation_score", "line_coverage"]] = report_data
+    aggregate[
+        [
+            "total_mutations",
+            "mutation_score",
+            "line_coverage",
+            "mutation_score_ci_low",
+            "mutation_score_ci_high",
+        ]
+    ] = report_data
+    # exact scores have an interval of zero width
+    for bound in ["mutation_score_ci_low", "mutation_score_ci_high"]:
+        aggregate[bound] = aggregate[bound].fillna(aggregate["mutation_score"])
+    # metrics start from line_coverage, see `classifier.import_frame`
+    aggregate.insert(
+        aggregate.columns.get_loc("line_coverage"),
+        "mutation_score_ci_low",
+        aggregate.pop("mutation_score_ci_low"),
+    )
+    aggregate.insert(
+        aggregate.columns.get_loc("line_coverage"),
+        "mutation_score_ci_high",
+        aggregate.pop("mutation_score_ci_high"),
+    )
 
     if clean:
         print(f'Rows before cleaning = {aggregate.shape[0]}')
@@ -44,7 +84,7 @@ def prepare_results(
 
     report_dir = METRICS_DIR / "mutation_reports"
     report_dir.mkdir(parents=True, exist_ok=True)
-    filename = report_dir / f"{operator}.csv"
+    filename = report_dir / f"{listed_operator(operator) if derive_from else operator}.csv"
     print(f"Saving to {filename}")
     aggregate.to_csv(filename, index=False)
 
@@ -54,21 +94,53 @@ def parse_html_report(row, operator, mutation_results_root) -> Optional[ParserOu
     path = mutation_results_root / row.project / row.commit / operator
     path = path / f"{row.test_name}({row.module})"
 
-    # find all reports in root folders of test runs
-    report_files = list(path.glob('*/index.html'))
-    if not report_files:
-        # no file = no mutations
-        return None
+    # sampled runs only leave an estimate
+    sampled = read_sampling_report(path)
+    if sampled is not None:
+        return sampled
+
+    # find the most recent report in root folders of test runs, or in their archive
+    with open_latest(path, 'index.html') as report:
+        if report is not None:
+            return PitestHTMLParser.parse(report)
+
+    # no file = no mutations
+    return None
+
+
+def parse_derived_report(
+    row, operator, source_operator, mutation_results_root
+) -> Optional[ParserOutput]:
+    """Get data about mutation results of `operator` from the XML report of a wider operator"""
+    path = mutation_results_root / row.project / row.commit / source_operator
+    path = path / f"{row.test_name}({row.module})"
+
+    with open_latest(path, 'mutations.xml') as report:
+        if report is None:
+            return None
+        result = PitestXMLParser.parse(report, operators_of_group(operator))
+
+    # line coverage doesn't depend on the operators, use the exact one when available
+    with open_latest(path, 'index.html') as report:
+        if report is not None:
+            result = result._replace(line_coverage=PitestHTMLParser.parse(report).line_coverage)
 
-    # use the most recent file (alphabetically last, because folder names are timestamps)
-    return PitestHTMLParser.parse(report_files[-1])
+    return result
 
 
 if __name__ == '__main__':
 
     def main():
+        parser = argparse.ArgumentParser()
+        parser.add_argument(
+            "--derive-from",
+            metavar="OPERATOR",
+            help="score every operator from the XML report of a single run of OPERATOR",
+        )
+        args = parser.parse_args()
+
         for operator in ALL_OPERATORS:
-            prepare_results(operator)
+            prepare_results(operator, derive_from=args.derive_from)
         # calculate_results()
 
     main()
@@ -0,0 +1,85 @@
+"""Coverage of the classes under test, used to skip pairs that can't kill any mutant.
+
+A single JaCoCo-instrumented `mvn test` runs the whole test suite of a module.
+A CUT with no covered line in `jacoco.xml` isn't touched by any test of the module,
+so neither by the test of its pair: PIT would only report uncovered mutants.
+
+JaCoCo merges the coverage of all the tests of a run, so the index is per module,
+not per test: pairs whose test misses a CUT covered by other tests still run.
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from effectiveness import settings
+from effectiveness.code_analysis.pom_module import CutPair
+from effectiveness.maven import MavenExecutor, UsageCallback
+from effectiveness.mutation.pitest_xml_parser import iter_elements
+
+JACOCO_PLUGIN = f"org.jacoco:jacoco-maven-plugin:{settings.JACOCO_VERSION}"
+
+
+def run_module_coverage(
+    maven: MavenExecutor,
+    project_path: Path,
+    module: str,
+    module_path: Path,
+    log_file: Path,
+    on_usage: Optional[UsageCallback] = None,
+) -> Optional[Path]:
+    """Runs the tests of the module with the JaCoCo agent
+
+    Returns:
+        the XML report, or None if JaCoCo couldn't write it
+    """
+    args = [
+        f"{JACOCO_PLUGIN}:prepare-agent",
+        "test",
+        f"{JACOCO_PLUGIN}:report",
+        "-Dmaven.test.failure.ignore=true",
+        "-Djacoco.report.formats=XML",
+    ]
+    if module:
+        args += ["--projects", module]
+
+    report = module_path / "target" / "site" / "jacoco" / "jacoco.xml"
+    if report.exists():
+        report.unlink()
+    try:
+        maven.run(
+            args,
+            cwd=project_path,
+            log_file=log_file,
+            timeout=settings.MUTATION_TIMEOUT,
+            on_usage=on_usage,
+        )
+    except subprocess.TimeoutExpired as te:
+        print(te)
+        return None
+    return report if report.exists() else None
+
+
+def covered_classes(report: Path) -> Set[str]:
+    """Qualified names of the top level classes with at least a covered line
+
+    Nested and anonymous classes count towards the class that contains them.
+    """
+    covered = set()
+    for element in iter_elements(report, 'class'):
+        lines = next(
+            (c for c in element.findall('counter') if c.get('type') == 'LINE'), None
+        )
+        if lines is not None and int(lines.get('covered', 0)) > 0:
+            covered.add(element.get('name').replace('/', '.').split('$', 1)[0])
+    return covered
+
+
+def split_uncovered(
+    cut_tests: List[CutPair], covered: Set[str]
+) -> Tuple[List[CutPair], List[CutPair]]:
+    """Returns the pairs whose CUT is covered and the ones whose CUT isn't"""
+    kept, skipped = [], []
+    for test in cut_tests:
+        (kept if test.source_qualified_name in covered else skipped).append(test)
+    return kept, skipped
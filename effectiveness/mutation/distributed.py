@@ -0,0 +1,540 @@
+"""Mutation runs split across several nodes.
+
+A coordinator enqueues one job per (project, commit, module, pair, operator)
+into a SQLite database on storage shared by all the nodes, `settings.MUTATION_QUEUE`.
+Workers on any node claim the jobs one at a time, the most expensive first,
+mutate them in their own copy of the project and write the reports
+into the usual `MUTATION_RESULTS_DIR` layout.
+
+A claim is a lease lasting the timeout of the job plus `settings.MUTATION_LEASE_MARGIN`,
+renewed every `settings.MUTATION_LEASE_RENEWAL` seconds while the worker is alive:
+the jobs of a worker that died are handed out again once their lease expires,
+up to `settings.MUTATION_MAX_ATTEMPTS` times. A worker only updates the jobs it holds.
+
+Workers started on the same node share its CPU budget, see `--local-workers`.
+
+Usage:
+    python -m effectiveness.mutation.distributed enqueue projects.csv [operator]
+    python -m effectiveness.mutation.distributed worker --local-workers N    # N times per node
+    python -m effectiveness.mutation.distributed status
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from effectiveness import settings
+from effectiveness.code_analysis.get_commit import get_last_commit_id
+from effectiveness.code_analysis.pom_module import CutPair
+from effectiveness.code_analysis.scan_project import load_cut_pairs, search_project_tests
+from effectiveness.maven import get_maven_executor
+from effectiveness.mutation import journal, profile
+from effectiveness.mutation.cache import MutationCache
+from effectiveness.mutation.report_store import ReportStore
+from effectiveness.mutation.run import (
+    ModuleRun,
+    MutationOptions,
+    compile_tests,
+    prepare_worktree,
+    restore_cached_reports,
+    run_pair_mutations,
+)
+from effectiveness.mutation.scheduler import History, Job, schedule
+from effectiveness.mutation.utils import get_projects
+from effectiveness.mutation.worktrees import WorktreePool
+from effectiveness.resources import mutation_allotment
+from effectiveness.utils import clear_dir
+
+# claimed by a worker that hasn't started PIT yet
+LEASED = 'leased'
+ACTIVE = (LEASED, journal.RUNNING)
+
+
+class QueuedJob(NamedTuple):
+    project: str
+    commit: str
+    module: str
+    pair: CutPair
+    operator: str
+    timeout: float
+
+
+class WorkQueue:
+    """Jobs of a distributed run in a SQLite database
+
+    The database uses the rollback journal, as WAL doesn't work over network filesystems.
+    It has the `mark` and `durations` methods of `MutationJournal`,
+    so that it can take its place in `MutationOptions`.
+    """
+
+    def __init__(self, path: Path = settings.MUTATION_QUEUE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        # transactions are explicit, see `_transaction`
+        self._connection = sqlite3.connect(path, timeout=120, isolation_level=None)
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    project TEXT NOT NULL,
+                    commit_id TEXT NOT NULL,
+                    module TEXT NOT NULL,
+                    test_path TEXT NOT NULL,
+                    test_name TEXT NOT NULL,
+                    class_path TEXT NOT NULL,
+                    class_name TEXT NOT NULL,
+                    operator TEXT NOT NULL,
+                    priority REAL NOT NULL,
+                    timeout REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL,
+                    finished_at REAL,
+                    duration REAL,
+                    lower_bound INTEGER NOT NULL DEFAULT 0,
+                    message TEXT,
+                    PRIMARY KEY (project, commit_id, module, test_name, class_name, operator)
+                )
+                """
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if 'lower_bound' not in columns:
+                connection.execute(
+                    "ALTER TABLE jobs ADD COLUMN lower_bound INTEGER NOT NULL DEFAULT 0"
+                )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_by_priority ON jobs (status, priority)"
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock at once, so two workers can't claim the same job
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def enqueue(
+        self,
+        project: str,
+        commit: str,
+        module: str,
+        project_path: Path,
+        operator: str,
+        jobs: List[Job],
+        replace: bool = True,
+    ):
+        """Adds single pair jobs, with source paths relative to the project
+
+        :param replace: reset the jobs already in the queue, keep them otherwise
+        """
+        rows = []
+        for job in jobs:
+            pair = job.pair
+            rows.append(
+                (
+                    project,
+                    commit,
+                    module,
+                    str(Path(pair.test_path).relative_to(project_path)),
+                    pair.test_qualified_name,
+                    str(Path(pair.source_path).relative_to(project_path)),
+                    pair.source_qualified_name,
+                    operator,
+                    job.cost,
+                    job.timeout,
+                    journal.PENDING,
+                )
+            )
+        with self._transaction() as connection:
+            connection.executemany(
+                f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO jobs "
+                f"(project, commit_id, module, test_path, test_name, class_path, class_name, "
+                f"operator, priority, timeout, status) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def claim(self, worker: str) -> Optional[QueuedJob]:
+        """Leases the most expensive job that is pending or whose lease expired"""
+        now = time.time()
+        active = ', '.join('?' * len(ACTIVE))
+        with self._transaction() as connection:
+            connection.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, message = 'lease expired' "
+                f"WHERE status IN ({active}) AND lease_until < ? AND attempts >= ?",
+                (journal.FAILED, now, *ACTIVE, now, settings.MUTATION_MAX_ATTEMPTS),
+            )
+            row = connection.execute(
+                f"SELECT rowid, project, commit_id, module, test_path, test_name, "
+                f"class_path, class_name, operator, timeout FROM jobs "
+                f"WHERE status = ? OR (status IN ({active}) AND lease_until < ?) "
+                f"ORDER BY priority DESC LIMIT 1",
+                (journal.PENDING, *ACTIVE, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            rowid, project, commit, module, test_path, test, class_path, cut, operator = row[:9]
+            timeout = row[9]
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                "lease_until = ?, started_at = NULL, finished_at = NULL, message = NULL "
+                "WHERE rowid = ?",
+                (LEASED, worker, now + timeout + settings.MUTATION_LEASE_MARGIN, rowid),
+            )
+
+        project_path = settings.PROJECTS_DIR / project
+        pair = CutPair(project_path / test_path, test, project_path / class_path, cut)
+        return QueuedJob(project, commit, module, pair, operator, timeout)
+
+    def mark(
+        self,
+        project: str,
+        commit: str,
+        module: str,
+        pair: CutPair,
+        operator: str,
+        status: str,
+        message: Optional[str] = None,
+        worker: Optional[str] = None,
+    ):
+        """Same as `MutationJournal.mark`
+
+        :param worker: only update the job if this worker holds it,
+            i.e. its lease wasn't handed out to another worker in the meantime
+        """
+        if status == journal.RUNNING:
+            update = "status = :status, started_at = :now"
+        else:
+            update = f"{journal.finish_update(status)}, lease_until = NULL"
+        with self._transaction() as connection:
+            connection.execute(
+                f"UPDATE jobs SET {update}, message = :message "
+                f"WHERE project = :project AND commit_id = :commit AND module = :module "
+                f"AND test_name = :test AND class_name = :cut AND operator = :operator "
+                f"AND (:worker IS NULL OR worker = :worker)",
+                dict(
+                    status=status,
+                    running=journal.RUNNING,
+                    now=time.time(),
+                    message=message,
+                    worker=worker,
+                    project=project,
+                    commit=commit,
+                    module=module,
+                    test=pair.test_qualified_name,
+                    cut=pair.source_qualified_name,
+                    operator=operator,
+                ),
+            )
+
+    def renew(self, job: QueuedJob, worker: str) -> bool:
+        """Extends the lease of a job by `settings.MUTATION_LEASE_MARGIN` from now
+
+        :return: whether the worker still holds the job
+        """
+        active = ', '.join('?' * len(ACTIVE))
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET lease_until = MAX(lease_until, ?) "
+                f"WHERE project = ? AND commit_id = ? AND module = ? AND test_name = ? "
+                f"AND class_name = ? AND operator = ? AND worker = ? AND status IN ({active})",
+                (
+                    time.time() + settings.MUTATION_LEASE_MARGIN,
+                    job.project,
+                    job.commit,
+                    job.module,
+                    job.pair.test_qualified_name,
+                    job.pair.source_qualified_name,
+                    job.operator,
+                    worker,
+                    *ACTIVE,
+                ),
+            )
+            return cursor.rowcount > 0
+
+    def durations(self, project: str, operator: str) -> History:
+        """Same as `MutationJournal.durations`"""
+        rows = self._connection.execute(
+            "SELECT module, test_name, class_name, duration, lower_bound FROM jobs "
+            "WHERE project = ? AND operator = ? AND duration IS NOT NULL "
+            "ORDER BY finished_at",
+            (project, operator),
+        ).fetchall()
+        return {
+            (module, test, cut): journal.Duration(duration, bool(lower_bound))
+            for module, test, cut, duration, lower_bound in rows
+        }
+
+    def summary(self) -> Dict[str, int]:
+        """Number of jobs by status"""
+        return dict(self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def unfinished(self) -> int:
+        return self._connection.execute(
+            f"SELECT COUNT(*) FROM jobs WHERE status IN (?, {', '.join('?' * len(ACTIVE))})",
+            (journal.PENDING, *ACTIVE),
+        ).fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+
+class WorkerJournal:
+    """The queue as the journal of a single worker, which only marks the jobs it holds"""
+
+    def __init__(self, queue: WorkQueue, worker: str):
+        self.queue = queue
+        self.worker = worker
+
+    def mark(self, *args, **kwargs):
+        self.queue.mark(*args, worker=self.worker, **kwargs)
+
+    def durations(self, project: str, operator: str) -> History:
+        return self.queue.durations(project, operator)
+
+
+def enqueue(queue: WorkQueue, projects: List[str], operator: str, resume: bool = False):
+    """Scans the projects and adds all their pairs to the queue"""
+    settings.RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    if not resume:
+        clear_dir(settings.MUTATION_RESULTS_DIR)
+        clear_dir(settings.LOGS_DIR)
+
+    for i, project in enumerate(projects):
+        print(f"* Enqueuing mutations for project {project} ({i + 1}/{len(projects)})")
+        project_path = settings.PROJECTS_DIR / project
+        commit = get_last_commit_id(project_path)
+        search_project_tests(project_path)
+        # durations of earlier distributed runs
+        history = queue.durations(project, operator)
+
+        for module_cuts in (settings.SCAN_PROJECT_DIR / project / commit).glob("tests_*.csv"):
+            loaded = load_cut_pairs(module_cuts)
+            if loaded is None:
+                continue
+
+            _, module, cut_tests = loaded
+            jobs = schedule(module, cut_tests, history)
+            queue.enqueue(project, commit, module, project_path, operator, jobs, replace=not resume)
+            print(f"* * Enqueued {len(jobs)} pairs of module {module}")
+
+
+class Worker:
+    """Runs queued jobs until there are none left
+
+    Every worker has a single copy of the project it's working on,
+    with the modules of the jobs it ran so far already compiled.
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        options: MutationOptions,
+        name: str = None,
+        worktrees_dir: Path = settings.WORKTREES_DIR,
+    ):
+        self.queue = queue
+        self.options = options
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.options.journal = WorkerJournal(queue, self.name)
+        self.worktrees_dir = worktrees_dir / self.name
+        self._pool: Optional[WorktreePool] = None
+        self._pool_commit: Optional[Tuple[str, str]] = None
+        self._compiled = set()
+
+    def run(self, poll_interval: float = 30):
+        """
+        :param poll_interval: seconds between claims while the remaining jobs
+            are leased by other workers, whose leases may still expire
+        """
+        try:
+            while True:
+                job = self.queue.claim(self.name)
+                if job is not None:
+                    self.run_job(job)
+                elif self.queue.unfinished():
+                    time.sleep(poll_interval)
+                else:
+                    break
+        finally:
+            self._close_pool()
+        print(f"* Worker {self.name} found no more jobs")
+
+    def _close_pool(self):
+        if self._pool is not None:
+            self._pool.cleanup()
+        self._pool = None
+        self._pool_commit = None
+        self._compiled = set()
+
+    def _worktrees(self, project: str, commit: str) -> WorktreePool:
+        if self._pool_commit != (project, commit):
+            self._close_pool()
+            self._pool = WorktreePool(
+                settings.PROJECTS_DIR / project,
+                1,
+                root=self.worktrees_dir,
+                prepare=prepare_worktree,
+            ).__enter__()
+            self._pool_commit = (project, commit)
+        return self._pool
+
+    @contextmanager
+    def _renewing(self, job: QueuedJob) -> Iterator[None]:
+        """Keeps the lease of the job alive until the block ends"""
+        stopped = threading.Event()
+
+        def renew():
+            # SQLite connections can't be shared between threads
+            queue = WorkQueue(self.queue.path)
+            try:
+                while not stopped.wait(settings.MUTATION_LEASE_RENEWAL):
+                    if not queue.renew(job, self.name):
+                        print(f"* * * Lost the lease of {job.pair.source_qualified_name}")
+                        break
+            finally:
+                queue.close()
+
+        renewer = threading.Thread(target=renew, name=f"renew-{self.name}", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            renewer.join()
+
+    def run_job(self, job: QueuedJob):
+        with self._renewing(job):
+            self._run_job(job)
+
+    def _run_job(self, job: QueuedJob):
+        project_path = settings.PROJECTS_DIR / job.project
+        module_path = project_path / job.module if job.module else project_path
+        results_path = settings.MUTATION_RESULTS_DIR / job.project / job.commit / job.operator
+        results_path.mkdir(parents=True, exist_ok=True)
+        mutation_logs = settings.LOGS_DIR / job.project
+        mutation_logs.mkdir(parents=True, exist_ok=True)
+
+        run = ModuleRun(
+            job.project,
+            job.commit,
+            job.module,
+            module_path.relative_to(project_path),
+            results_path,
+            mutation_logs,
+            job.operator,
+            self.options,
+        )
+
+        current_commit = get_last_commit_id(project_path)
+        if current_commit != job.commit:
+            run.mark([job.pair], journal.FAILED, f"{job.project} is at commit {current_commit}")
+            return
+
+        if self.options.cache is not None and not restore_cached_reports(run, [job.pair]):
+            return
+
+        pool = self._worktrees(job.project, job.commit)
+        try:
+            if job.module not in self._compiled:
+                print(f"* * Compiling tests of {job.project} {job.module}")
+                with pool.checkout() as worktree:
+                    compile_tests(
+                        self.options.maven,
+                        worktree,
+                        job.module,
+                        mutation_logs,
+                        run.on_usage(profile.TEST_COMPILE),
+                    )
+                self._compiled.add(job.module)
+
+            run_pair_mutations(pool, run, job.pair, job.timeout)
+        except subprocess.CalledProcessError as cpe:
+            print(cpe)
+            run.mark([job.pair], journal.FAILED, str(cpe))
+        except Exception as e:
+            # already marked as failed by `run_pair_mutations`, keep going with the other jobs
+            print(f"* * * Failed {job.pair.source_qualified_name}: {e!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--queue", type=Path, default=settings.MUTATION_QUEUE, help="shared job database"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="add the pairs of the projects")
+    enqueue_parser.add_argument("projects_csv", help="csv file with project list")
+    enqueue_parser.add_argument("operator", nargs="?", default="ALL")
+    enqueue_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="keep previous results and the status of the jobs already in the queue",
+    )
+
+    worker_parser = subparsers.add_parser("worker", help="run jobs until the queue is empty")
+    worker_parser.add_argument("--name", help="unique name of the worker, host-pid by default")
+    worker_parser.add_argument(
+        "--worktrees-dir",
+        type=Path,
+        default=settings.WORKTREES_DIR,
+        help="where the worker copies the projects, preferably on a local disk",
+    )
+    worker_parser.add_argument(
+        "--local-workers",
+        type=int,
+        default=settings.MUTATION_WORKERS,
+        help="workers started on this node, which share its CPU budget, "
+        "as many as 4 PIT threads each allow by default",
+    )
+    worker_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always run PIT, even for pairs whose sources didn't change",
+    )
+    worker_parser.add_argument(
+        "--archive-reports",
+        action="store_true",
+        help="keep the reports of every pair in a single compressed reports.zip",
+    )
+    worker_parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="start a new Maven JVM for every command even if mvnd is installed",
+    )
+
+    subparsers.add_parser("status", help="print the number of jobs by status")
+
+    args = parser.parse_args()
+    queue = WorkQueue(args.queue)
+
+    if args.command == "enqueue":
+        enqueue(queue, get_projects(args.projects_csv), args.operator, resume=args.resume)
+    elif args.command == "worker":
+        options = MutationOptions(
+            workers=1,
+            pit_threads=mutation_allotment(args.local_workers).threads,
+            journal=None,
+            cache=None if args.no_cache else MutationCache(),
+            reports=ReportStore(archive=args.archive_reports),
+            maven=get_maven_executor(use_daemon=not args.no_daemon),
+        )
+        Worker(queue, options, args.name, args.worktrees_dir).run()
+    else:
+        for status, count in sorted(queue.summary().items()):
+            print(f"{status}: {count}")
@@ -0,0 +1,75 @@
+"""PIT history files, to reuse the results of single mutants across commits.
+
+PIT writes the result of every mutant to `historyOutputFile` and, given the file
+of an earlier run as `historyInputFile`, only analyses again the mutants
+of classes (or tests) that changed since.
+One file is kept per (project, module, operator, pair) under `settings.PIT_HISTORY_DIR`.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+from effectiveness import settings
+from effectiveness.code_analysis.pom_module import CutPair
+
+HISTORY_SUFFIX = '.history'
+
+
+class PitHistoryStore:
+    def __init__(self, root: Path = settings.PIT_HISTORY_DIR):
+        self.root = root
+
+    def _dir(self, project: str, module: str, operator: str) -> Path:
+        return self.root / project / (module or '_') / operator
+
+    def path(self, project: str, module: str, operator: str, pair: CutPair) -> Path:
+        name = f"{pair.test_qualified_name}({pair.source_qualified_name}){HISTORY_SUFFIX}"
+        return self._dir(project, module, operator) / name
+
+    @contextmanager
+    def use(
+        self, project: str, module: str, operator: str, pair: CutPair
+    ) -> Iterator[Tuple[Optional[Path], Path]]:
+        """Input and output history files of a PIT run
+
+        The output replaces the stored history only once PIT has written it,
+        so a run killed halfway can't leave a truncated file behind.
+        """
+        path = self.path(project, module, operator, pair)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        output = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            yield (path if path.exists() else None), output
+            if output.exists():
+                os.replace(output, path)
+        finally:
+            if output.exists():
+                output.unlink()
+
+    def prune(
+        self,
+        project: str,
+        module: str,
+        operator: str,
+        pairs: Iterable[CutPair],
+        max_age: float = settings.PIT_HISTORY_MAX_AGE,
+    ):
+        """Removes the history of pairs the module no longer has,
+        and any history not updated for `max_age` seconds
+        """
+        directory = self._dir(project, module, operator)
+        if not directory.exists():
+            return
+
+        current = {self.path(project, module, operator, pair).name for pair in pairs}
+        oldest = time.time() - max_age
+        removed = 0
+        for file in directory.glob(f"*{HISTORY_SUFFIX}"):
+            if file.name not in current or file.stat().st_mtime < oldest:
+                file.unlink()
+                removed += 1
+        if removed:
+            print(f"* * Removed {removed} stale PIT history files")
@@ -0,0 +1,198 @@
+"""Durable record of the progress of mutation runs, used to resume interrupted runs."""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+from effectiveness import settings
+from effectiveness.code_analysis.pom_module import CutPair
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+TIMED_OUT = 'timed_out'
+# left out before mutating, e.g. because the tests don't cover the CUT
+SKIPPED = 'skipped'
+
+# statuses that won't change by running the pair again
+FINISHED = (DONE, SKIPPED)
+# statuses that may, e.g. after a crash or on a less loaded host, retried on resume
+RETRIED = (FAILED, TIMED_OUT)
+
+
+class Duration(NamedTuple):
+    seconds: float
+    # the run was stopped (e.g. timed out) after that many seconds, so it takes longer
+    lower_bound: bool = False
+
+
+def finish_update(status: str) -> str:
+    """SET clause of a job that stops running with `status`
+
+    Only jobs that actually ran have a duration, cache hits don't.
+    A finished run replaces the duration, a failed or timed out one only raises it
+    to a lower bound. The parameters are `:status`, `:running` and `:now`.
+    """
+    update = "status = :status, finished_at = :now"
+    elapsed = "(:now - started_at)"
+    if status == DONE:
+        return (
+            f"duration = CASE WHEN status = :running THEN {elapsed} ELSE duration END, "
+            f"lower_bound = CASE WHEN status = :running THEN 0 ELSE lower_bound END, {update}"
+        )
+    if status in RETRIED:
+        raised = f"status = :running AND (duration IS NULL OR duration < {elapsed})"
+        return (
+            f"duration = CASE WHEN {raised} THEN {elapsed} ELSE duration END, "
+            f"lower_bound = CASE WHEN {raised} THEN 1 ELSE lower_bound END, {update}"
+        )
+    return update
+
+
+class MutationJournal:
+    """Status of every (project, commit, module, pair, operator) job in a SQLite database"""
+
+    def __init__(self, path: Path = settings.MUTATION_JOURNAL):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        with self._lock, self._connection as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    project TEXT NOT NULL,
+                    commit_id TEXT NOT NULL,
+                    module TEXT NOT NULL,
+                    test_name TEXT NOT NULL,
+                    class_name TEXT NOT NULL,
+                    operator TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL,
+                    finished_at REAL,
+                    message TEXT,
+                    duration REAL,
+                    lower_bound INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (project, commit_id, module, test_name, class_name, operator)
+                )
+                """
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if 'duration' not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN duration REAL")
+            if 'lower_bound' not in columns:
+                connection.execute(
+                    "ALTER TABLE jobs ADD COLUMN lower_bound INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def reset(self):
+        """Marks all jobs as pending, keeping their durations as history"""
+        with self._lock, self._connection as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, message = NULL", (PENDING,)
+            )
+
+    def add_pending(
+        self, project: str, commit: str, module: str, pairs: Iterable[CutPair], operator: str
+    ):
+        """Registers the jobs, keeping the status of the ones already known"""
+        with self._lock, self._connection as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO jobs "
+                "(project, commit_id, module, test_name, class_name, operator, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        project,
+                        commit,
+                        module,
+                        pair.test_qualified_name,
+                        pair.source_qualified_name,
+                        operator,
+                        PENDING,
+                    )
+                    for pair in pairs
+                ],
+            )
+
+    def finished_pairs(
+        self,
+        project: str,
+        commit: str,
+        module: str,
+        operator: str,
+        max_attempts: int = settings.MUTATION_MAX_ATTEMPTS,
+    ) -> Set[Tuple[str, str]]:
+        """Returns (test_name, class_name) of the jobs that don't need to run again
+
+        :param max_attempts: failed and timed out jobs are run again until they've been tried
+            that many times
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT test_name, class_name FROM jobs "
+                f"WHERE project = ? AND commit_id = ? AND module = ? AND operator = ? "
+                f"AND (status IN ({', '.join('?' * len(FINISHED))}) "
+                f"OR (status IN ({', '.join('?' * len(RETRIED))}) AND attempts >= ?))",
+                (project, commit, module, operator, *FINISHED, *RETRIED, max_attempts),
+            ).fetchall()
+        return set(rows)
+
+    def durations(self, project: str, operator: str) -> Dict[Tuple[str, str, str], Duration]:
+        """Returns the last known duration of every (module, test_name, class_name),
+        from any commit of the project
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT module, test_name, class_name, duration, lower_bound FROM jobs "
+                "WHERE project = ? AND operator = ? AND duration IS NOT NULL "
+                "ORDER BY finished_at",
+                (project, operator),
+            ).fetchall()
+        return {
+            (module, test, cut): Duration(duration, bool(lower_bound))
+            for module, test, cut, duration, lower_bound in rows
+        }
+
+    def mark(
+        self,
+        project: str,
+        commit: str,
+        module: str,
+        pair: CutPair,
+        operator: str,
+        status: str,
+        message: Optional[str] = None,
+    ):
+        if status == RUNNING:
+            update = (
+                "status = :status, attempts = attempts + 1, started_at = :now, finished_at = NULL"
+            )
+        else:
+            update = finish_update(status)
+        with self._lock, self._connection as connection:
+            connection.execute(
+                f"UPDATE jobs SET {update}, message = :message "
+                f"WHERE project = :project AND commit_id = :commit AND module = :module "
+                f"AND test_name = :test AND class_name = :cut AND operator = :operator",
+                dict(
+                    status=status,
+                    running=RUNNING,
+                    now=time.time(),
+                    message=message,
+                    project=project,
+                    commit=commit,
+                    module=module,
+                    test=pair.test_qualified_name,
+                    cut=pair.source_qualified_name,
+                    operator=operator,
+                ),
+            )
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,218 @@
+"""Columnar store of every mutant of a project, with the tests that killed it.
+
+One compressed NumPy archive per (project, commit, operator) run holds
+one row per mutant, with dictionary-encoded mutator and status columns,
+and a sparse (mutant, test) kill matrix.
+Scores of any operator subset are then a few vectorized operations away,
+without parsing the reports again.
+
+Only runs with XML output (`run.py --output-formats XML` or `--derivable`)
+have per-mutant data; `run.py` stores their matrix at the end of every project.
+PIT only runs every test against a mutant with `fullMutationMatrix`,
+from `settings.PIT_FULL_MATRIX_VERSION` on. With older versions, such as the default one,
+a mutant lists only the first test that killed it, so the kill matrix holds
+at most one killing test per mutant and `killed_by` misses the tests that came later:
+mutation scores are exact, which tests killed a mutant isn't.
+"""
+
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from effectiveness import settings
+from effectiveness.mutation.mutators import operator_of_mutator, operators_of_group
+from effectiveness.mutation.pitest_xml_parser import DETECTED_STATUSES, PitestXMLParser
+from effectiveness.mutation.report_store import open_latest
+
+STATUSES = np.array(
+    [
+        'KILLED',
+        'SURVIVED',
+        'NO_COVERAGE',
+        'TIMED_OUT',
+        'NON_VIABLE',
+        'MEMORY_ERROR',
+        'RUN_ERROR',
+        'NOT_STARTED',
+        'STARTED',
+    ]
+)
+
+
+class _Encoder:
+    """Assigns consecutive codes to values, in order of appearance"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.codes: Dict[str, int] = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value: str) -> int:
+        return self.codes.setdefault(value, len(self.codes))
+
+    def values(self) -> np.ndarray:
+        return np.array(list(self.codes), dtype=str)
+
+
+@dataclass
+class KillMatrix:
+    # one entry per pair: report directory `<test_name>(<module>)` split in two
+    pair_tests: np.ndarray
+    pair_modules: np.ndarray
+    # one entry per mutant
+    pair: np.ndarray
+    mutated_class: np.ndarray
+    line: np.ndarray
+    mutator: np.ndarray
+    status: np.ndarray
+    # dictionaries of the encoded columns
+    classes: np.ndarray
+    mutators: np.ndarray
+    tests: np.ndarray
+    # sparse kill matrix, one entry per (mutant, killing test)
+    kill_mutant: np.ndarray
+    kill_test: np.ndarray
+
+    @property
+    def detected(self) -> np.ndarray:
+        return np.isin(STATUSES, list(DETECTED_STATUSES))[self.status]
+
+    def operator_mask(self, operators: Optional[Iterable[str]]) -> np.ndarray:
+        """Mutants created by the given single operators (all if None)"""
+        if operators is None:
+            return np.ones(len(self.mutator), dtype=bool)
+        operators = set(operators)
+        selected = np.array([operator_of_mutator(m) in operators for m in self.mutators], bool)
+        return selected[self.mutator]
+
+    def scores(self, operators: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Total mutants and mutation score of every pair for a subset of operators"""
+        mask = self.operator_mask(operators)
+        n_pairs = len(self.pair_tests)
+        total = np.bincount(self.pair[mask], minlength=n_pairs)
+        detected = np.bincount(self.pair[mask], weights=self.detected[mask], minlength=n_pairs)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = np.where(total > 0, detected / total, np.nan)
+
+        return pd.DataFrame(
+            {
+                'test_name': self.pair_tests,
+                'module': self.pair_modules,
+                'total_mutations': total,
+                'mutation_score': score,
+            }
+        )
+
+    def group_scores(self, operator: str) -> pd.DataFrame:
+        """Scores of an operator (or operator group) from `settings.OPERATORS`"""
+        return self.scores(operators_of_group(operator))
+
+    def killed_by(self, test: str) -> np.ndarray:
+        """Indices of the mutants killed by a test method (or any method of a test class),
+        only those it killed first unless PIT ran with `fullMutationMatrix`
+        """
+        matching = np.flatnonzero(
+            np.char.startswith(self.tests, f"{test}.") | (self.tests == test)
+        )
+        return np.unique(self.kill_mutant[np.isin(self.kill_test, matching)])
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, **vars(self))
+
+    @classmethod
+    def load(cls, path: Path) -> 'KillMatrix':
+        with np.load(path) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+
+REPORT_DIR_PATTERN = re.compile(r"^(?P<test>.*)\((?P<module>.*)\)$")
+
+
+def build_kill_matrix(results_path: Path) -> KillMatrix:
+    """Collects the latest `mutations.xml` of every pair of a run
+    in `MUTATION_RESULTS_DIR/<project>/<commit>/<operator>`
+    """
+    pair_tests: List[str] = []
+    pair_modules: List[str] = []
+    columns: Dict[str, List[int]] = {
+        'pair': [],
+        'mutated_class': [],
+        'line': [],
+        'mutator': [],
+        'status': [],
+        'kill_mutant': [],
+        'kill_test': [],
+    }
+    classes, mutators, tests = _Encoder(), _Encoder(), _Encoder()
+    statuses = _Encoder(STATUSES)
+
+    for report_dir in sorted(p for p in results_path.iterdir() if p.is_dir()):
+        match = REPORT_DIR_PATTERN.match(report_dir.name)
+        if match is None:
+            continue
+
+        with open_latest(report_dir, 'mutations.xml') as report:
+            if report is None:
+                continue
+
+            pair_index = len(pair_tests)
+            pair_tests.append(match['test'])
+            pair_modules.append(match['module'])
+
+            for mutant in PitestXMLParser.iter_mutants(report):
+                mutant_index = len(columns['pair'])
+                columns['pair'].append(pair_index)
+                columns['mutated_class'].append(classes.encode(mutant.mutated_class))
+                columns['line'].append(mutant.line)
+                columns['mutator'].append(mutators.encode(mutant.mutator))
+                columns['status'].append(statuses.encode(mutant.status))
+                for test in filter(None, (mutant.killing_test or '').split('|')):
+                    columns['kill_mutant'].append(mutant_index)
+                    columns['kill_test'].append(tests.encode(test))
+
+    return KillMatrix(
+        pair_tests=np.array(pair_tests, dtype=str),
+        pair_modules=np.array(pair_modules, dtype=str),
+        pair=np.array(columns['pair'], dtype=np.int32),
+        mutated_class=np.array(columns['mutated_class'], dtype=np.int32),
+        line=np.array(columns['line'], dtype=np.int32),
+        mutator=np.array(columns['mutator'], dtype=np.int16),
+        status=np.array(columns['status'], dtype=np.int8),
+        classes=classes.values(),
+        mutators=mutators.values(),
+        tests=tests.values(),
+        kill_mutant=np.array(columns['kill_mutant'], dtype=np.int32),
+        kill_test=np.array(columns['kill_test'], dtype=np.int32),
+    )
+
+
+def kill_matrix_path(project: str, commit: str, operator: str) -> Path:
+    return settings.KILL_MATRIX_DIR / project / commit / f"{operator}.npz"
+
+
+def store_kill_matrix(project: str, commit: str, operator: str) -> Path:
+    results_path = settings.MUTATION_RESULTS_DIR / project / commit / operator
+    path = kill_matrix_path(project, commit, operator)
+    build_kill_matrix(results_path).save(path)
+    return path
+
+
+if __name__ == '__main__':
+
+    def main():
+        """Stores the kill matrix of every run found in MUTATION_RESULTS_DIR,
+        or only of the projects given as arguments
+        """
+        projects = sys.argv[1:] or [p.name for p in settings.MUTATION_RESULTS_DIR.iterdir()]
+        for project in projects:
+            for results_path in sorted(settings.MUTATION_RESULTS_DIR.glob(f"{project}/*/*")):
+                commit, operator = results_path.parent.name, results_path.name
+                path = store_kill_matrix(project, commit, operator)
+                print(f"* Saved kill matrix of {project} {operator} to {path}")
+
+    main()
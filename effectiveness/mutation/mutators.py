@@ -0,0 +1,46 @@
+"""Mapping between the PIT operators in `settings.OPERATORS` and the mutator classes
+that PIT writes in the `mutator` field of `mutations.xml`.
+"""
+
+from typing import Optional, Set
+
+from effectiveness.mutation.utils import expand_operator
+
+# simple class names of the mutators implementing each operator
+OPERATOR_MUTATORS = {
+    "CONDITIONALS_BOUNDARY": "ConditionalsBoundaryMutator",
+    "INCREMENTS": "IncrementsMutator",
+    "INVERT_NEGS": "InvertNegsMutator",
+    "MATH": "MathMutator",
+    "NEGATE_CONDITIONALS": "NegateConditionalsMutator",
+    "VOID_METHOD_CALLS": "VoidMethodCallMutator",
+    "RETURN_VALS": "ReturnValsMutator",
+    "TRUE_RETURNS": "BooleanTrueReturnValsMutator",
+    "FALSE_RETURNS": "BooleanFalseReturnValsMutator",
+    "PRIMITIVE_RETURNS": "PrimitiveReturnsMutator",
+    "EMPTY_RETURNS": "EmptyObjectReturnValsMutator",
+    "NULL_RETURNS": "NullReturnValsMutator",
+    "REMOVE_CONDITIONALS": "RemoveConditionalMutator",
+    "EXPERIMENTAL_SWITCH": "SwitchMutator",
+    "INLINE_CONSTS": "InlineConstantMutator",
+    "CONSTRUCTOR_CALLS": "ConstructorCallMutator",
+    "NON_VOID_METHOD_CALLS": "NonVoidMethodCallMutator",
+    "REMOVE_INCREMENTS": "RemoveIncrementsMutator",
+    "EXPERIMENTAL_MEMBER_VARIABLE": "MemberVariableMutator",
+}
+
+_MUTATOR_OPERATORS = {mutator: operator for operator, mutator in OPERATOR_MUTATORS.items()}
+
+
+def operator_of_mutator(mutator: str) -> Optional[str]:
+    """Returns the operator of a mutator class name from PIT's report
+
+    e.g. `org.pitest.mutationtest.engine.gregor.mutators.RemoveConditionalMutator_EQUAL_IF`
+    -> `REMOVE_CONDITIONALS`
+    """
+    simple_name = mutator.rsplit('.', 1)[-1].split('_', 1)[0]
+    return _MUTATOR_OPERATORS.get(simple_name)
+
+
+def operators_of_group(operator: str) -> Set[str]:
+    return set(expand_operator(operator))
@@ -2,13 +2,16 @@ from __future__ import division
 
 from html.parser import HTMLParser
 from pathlib import Path
-from typing import NamedTuple
+from typing import IO, NamedTuple, Optional, Union
 
 
 class ParserOutput(NamedTuple):
     total_mutants: int
     mutation_coverage: float
     line_coverage: float
+    # confidence interval of the mutation coverage when estimated from a sample of mutants
+    mutation_coverage_low: Optional[float] = None
+    mutation_coverage_high: Optional[float] = None
 
 
 class PitestHTMLParser(HTMLParser):
@@ -21,9 +24,12 @@ class PitestHTMLParser(HTMLParser):
         self._line_coverage = None
 
     @classmethod
-    def parse(cls, file: Path) -> ParserOutput:
+    def parse(cls, file: Union[Path, IO[bytes]]) -> ParserOutput:
+        """
+        :param file: the `index.html` report, or a binary file with its contents
+        """
         self = cls()
-        self.feed(file.read_text())
+        self.feed(file.read_text() if isinstance(file, Path) else file.read().decode())
         return ParserOutput(self._total_mutants, self._mutation_coverage, self._line_coverage)
 
     def handle_starttag(self, tag, attrs):
@@ -0,0 +1,81 @@
+from pathlib import Path
+from typing import IO, Iterator, NamedTuple, Optional, Set, Union
+from xml.etree import ElementTree as ET
+
+from effectiveness.mutation.mutators import operator_of_mutator
+from effectiveness.mutation.pitest_html_parser import ParserOutput
+
+# statuses counted as killed in the mutation score
+DETECTED_STATUSES = {'KILLED', 'TIMED_OUT', 'NON_VIABLE', 'MEMORY_ERROR', 'RUN_ERROR'}
+
+
+class MutantRecord(NamedTuple):
+    mutated_class: str
+    method: str
+    line: int
+    mutator: str
+    status: str
+    detected: bool
+    # `|`-separated when PIT ran with the full mutation matrix
+    killing_test: Optional[str]
+
+
+def iter_elements(file: Union[Path, IO[bytes]], tag: str) -> Iterator[ET.Element]:
+    """Yields the elements with the given tag of an XML report one by one
+
+    Every element is discarded once the caller moves to the next one,
+    so memory doesn't grow with the size of the report.
+    """
+    root = None
+    for event, element in ET.iterparse(file, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+        elif element.tag == tag:
+            yield element
+            root.clear()
+
+
+def iter_mutation_elements(file: Union[Path, IO[bytes]]) -> Iterator[ET.Element]:
+    return iter_elements(file, 'mutation')
+
+
+class PitestXMLParser:
+    """Parser for PIT's `mutations.xml`
+
+    The XML report has no line coverage of the class under test, and the lines
+    of the mutants aren't all the lines of the class, so line coverage is left unknown (NaN).
+    """
+
+    @staticmethod
+    def iter_mutants(file: Union[Path, IO[bytes]]) -> Iterator[MutantRecord]:
+        for mutation in iter_mutation_elements(file):
+            yield MutantRecord(
+                mutated_class=mutation.findtext('mutatedClass', ''),
+                method=mutation.findtext('mutatedMethod', ''),
+                line=int(mutation.findtext('lineNumber') or 0),
+                mutator=mutation.findtext('mutator', ''),
+                status=mutation.get('status', ''),
+                detected=mutation.get('detected') == 'true',
+                killing_test=mutation.findtext('killingTest') or mutation.findtext('killingTests'),
+            )
+
+    @classmethod
+    def parse(
+        cls, file: Union[Path, IO[bytes]], operators: Optional[Set[str]] = None
+    ) -> ParserOutput:
+        """
+        :param file: the `mutations.xml` report, or a binary file with its contents
+        :param operators: count only mutants created by these operators, all if None
+        """
+        total = 0
+        detected = 0
+        for mutant in cls.iter_mutants(file):
+            if operators is not None and operator_of_mutator(mutant.mutator) not in operators:
+                continue
+
+            total += 1
+            detected += mutant.detected
+
+        mutation_coverage = detected / total if total > 0 else float("NaN")
+        return ParserOutput(total, mutation_coverage, float("NaN"))
@@ -0,0 +1,122 @@
+"""Cost of a mutation run, estimated without running PIT.
+
+`run.py --plan` scans the projects and makes the same jobs as a real run would,
+then adds up their predicted durations (see `scheduler`).
+Projects without durations of the operator in the journal are priced from the static
+cost of their pairs at `settings.PLAN_SECONDS_PER_COST`, scaled by the share of the operators
+of `ALL` being run, plus `settings.PLAN_RUN_OVERHEAD` for every PIT run.
+
+Wall time assumes the modules run one after the other, as in `run.py`,
+and the jobs of a module go longest first to the first free worker.
+"""
+
+import heapq
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import pandas as pd
+from effectiveness import settings
+from effectiveness.code_analysis.get_commit import get_last_commit_id
+from effectiveness.code_analysis.pom_module import CutPair
+from effectiveness.code_analysis.scan_project import load_cut_pairs, search_project_tests
+from effectiveness.mutation.journal import MutationJournal
+from effectiveness.mutation.scheduler import History, schedule
+from effectiveness.mutation.utils import expand_operator
+
+
+@dataclass
+class ModulePlan:
+    project: str
+    module: str
+    pairs: int
+    jobs: int
+    # seconds of all the PIT runs of the module
+    run_time: float
+    # seconds until the last PIT run ends
+    wall_time: float
+    # whether the durations come from earlier runs in the journal
+    from_history: bool
+
+
+def makespan(durations: List[float], workers: int) -> float:
+    """End of the last job when every job, in order, goes to the first free worker"""
+    loads = [0.0] * max(1, min(workers, len(durations)))
+    for duration in durations:
+        heapq.heapreplace(loads, loads[0] + duration)
+    return max(loads)
+
+
+def plan_module(
+    project: str,
+    module: str,
+    cut_tests: List[CutPair],
+    operator: str,
+    history: History,
+    workers: int,
+) -> ModulePlan:
+    jobs = schedule(module, cut_tests, history)
+
+    if history:
+        durations = [job.cost for job in jobs]
+    else:
+        # the number of mutants grows with the operators being run
+        share = len(expand_operator(operator)) / len(settings.OPERATORS["ALL"])
+        rate = settings.PLAN_SECONDS_PER_COST * share
+        durations = [job.cost * rate + settings.PLAN_RUN_OVERHEAD for job in jobs]
+
+    return ModulePlan(
+        project,
+        module,
+        len(cut_tests),
+        len(jobs),
+        sum(durations),
+        makespan(durations, workers),
+        bool(history),
+    )
+
+
+def plan_project(
+    project: str,
+    operator: str,
+    workers: int,
+    journal: Optional[MutationJournal] = None,
+) -> List[ModulePlan]:
+    project_path = settings.PROJECTS_DIR / project
+    cuts_path = settings.SCAN_PROJECT_DIR / project / get_last_commit_id(project_path)
+    search_project_tests(project_path)
+
+    history = journal.durations(project, operator) if journal is not None else {}
+    plans = []
+    for module_cuts in sorted(cuts_path.glob("tests_*.csv")):
+        loaded = load_cut_pairs(module_cuts)
+        if loaded is None:
+            continue
+
+        _, module, cut_tests = loaded
+        plans.append(plan_module(project, module, cut_tests, operator, history, workers))
+    return plans
+
+
+def print_plan(plans: List[ModulePlan], operator: str, workers: int, threads: int):
+    if not plans:
+        print("* Nothing to mutate")
+        return
+
+    frame = pd.DataFrame([asdict(plan) for plan in plans])
+    hours = frame[['run_time', 'wall_time']] / 3600
+    frame[['run_hours', 'wall_hours']] = hours
+    frame = frame.drop(columns=['run_time', 'wall_time'])
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(f"* Plan for operator {operator}")
+        print(frame.to_string(index=False, float_format="{:.2f}".format))
+
+    run_hours = frame['run_hours'].sum()
+    print(f"* Pairs: {frame['pairs'].sum()} in {frame['jobs'].sum()} PIT runs")
+    print(f"* Projected PIT time: {run_hours:.1f} h, {run_hours * threads:.1f} CPU-hours")
+    print(
+        f"* Projected wall time with {workers} workers of {threads} threads: "
+        f"{frame['wall_hours'].sum():.1f} h"
+    )
+    guessed = (~frame['from_history']).sum()
+    if guessed:
+        print(f"* {guessed} modules have no recorded durations, their time is a rough guess")
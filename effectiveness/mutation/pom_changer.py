@@ -1,12 +1,32 @@
 import os
+import re
 import sys
 from pathlib import Path
+from typing import List, Optional, Union
 
+from effectiveness.pom_model import PomModel
 from effectiveness.pom_utils import ET, POM_NSMAP, indent, obj_to_xml
-from effectiveness.settings import PIT_VERSION
+from effectiveness.settings import PIT_FULL_MATRIX_VERSION, PIT_VERSION
 
 
-def pitest_plugin_element(class_to_mutate, test_to_run, mutator='ALL', threads=4) -> ET.Element:
+def _version(version: str) -> tuple:
+    return tuple(int(part) for part in re.findall(r"\d+", version))
+
+
+def full_mutation_matrix_supported(pit_version: str = PIT_VERSION) -> bool:
+    return _version(pit_version) >= _version(PIT_FULL_MATRIX_VERSION)
+
+
+def _as_list(value: Union[str, List[str]]) -> List[str]:
+    return [value] if isinstance(value, str) else list(value)
+
+
+def pitest_plugin_element() -> ET.Element:
+    """The PIT plugin with the configuration shared by all runs
+
+    Anything set here can't be overridden from the command line,
+    so the per-run parameters are left to `pitest_properties`.
+    """
     plugin = ET.Element('plugin')
     plugin_elements = {
         "groupId": "org.pitest",
@@ -14,10 +34,6 @@ def pitest_plugin_element(class_to_mutate, test_to_run, mutator='ALL', threads=4
         "version": PIT_VERSION,
         "configuration": {
             "failWhenNoMutations": "false",
-            "targetClasses": dict(param=class_to_mutate),
-            "targetTests": dict(param=test_to_run),
-            "mutators": dict(mutator=mutator),
-            "threads": threads,
             "avoidCallsTo": [
                 dict(avoidCallsTo="java.util.logging"),
                 dict(avoidCallsTo="org.apache.log4j"),
@@ -30,22 +46,56 @@ def pitest_plugin_element(class_to_mutate, test_to_run, mutator='ALL', threads=4
     return obj_to_xml(plugin, plugin_elements)
 
 
-def add_pitest_plugin(
-    pom: Path, target: Path, *, class_to_mutate: str, test_to_run: str, mutator='ALL'
-):
-    pom = ET.parse(pom)
+def pitest_properties(
+    class_to_mutate: Union[str, List[str]],
+    test_to_run: Union[str, List[str]],
+    mutator: Union[str, List[str]] = 'ALL',
+    threads: int = 4,
+    full_mutation_matrix=False,
+    excluded_methods: List[str] = (),
+    history_input: Optional[Path] = None,
+    history_output: Optional[Path] = None,
+) -> List[str]:
+    """Command line properties with the parameters of a single PIT run"""
+    properties = {
+        "targetClasses": ",".join(_as_list(class_to_mutate)),
+        "targetTests": ",".join(_as_list(test_to_run)),
+        "mutators": ",".join(_as_list(mutator)),
+        "threads": threads,
+    }
+    if full_mutation_matrix:
+        # every test killing a mutant, not only the first one
+        properties["fullMutationMatrix"] = "true"
+    if excluded_methods:
+        properties["excludedMethods"] = ",".join(excluded_methods)
+    # results of the mutants of unchanged classes are read from the history instead
+    if history_input is not None:
+        properties["historyInputFile"] = history_input
+    if history_output is not None:
+        properties["historyOutputFile"] = history_output
+
+    return [f"-D{name}={value}" for name, value in properties.items()]
+
+
+def add_pitest_plugin(pom: Path, target: Path):
+    """Adds the PIT plugin to the build, once for all the runs in the project tree"""
+    pom = PomModel.load(pom).copy_tree()
     plugins = pom.find(".//pom:build//pom:plugins", POM_NSMAP)
-    plugins.append(pitest_plugin_element(class_to_mutate, test_to_run, mutator))
+    if plugins is None:
+        build = pom.find("./pom:build", POM_NSMAP)
+        if build is None:
+            build = ET.SubElement(pom.getroot(), "build")
+        plugins = ET.SubElement(build, "plugins")
+
+    plugins.append(pitest_plugin_element())
     indent(pom, space=" " * 4)
     pom.write(target)
 
 
 if __name__ == '__main__':
     original_pom, new_pom, class_to_mutate, test_to_run, operator = sys.argv[1:]
-    add_pitest_plugin(
-        original_pom,
-        new_pom,
-        class_to_mutate=class_to_mutate,
-        test_to_run=test_to_run,
-        mutator=operator,
+    add_pitest_plugin(original_pom, new_pom)
+    print(
+        "mvn org.pitest:pitest-maven:mutationCoverage",
+        *pitest_properties(class_to_mutate, test_to_run, operator),
     )
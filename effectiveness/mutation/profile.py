@@ -0,0 +1,143 @@
+"""Where the time of the mutation runs goes.
+
+Every process launched by `run.py` (test compilation, coverage, PIT)
+and the copy of its reports are recorded as one JSON object per line
+in `settings.MUTATION_PROFILE`, with their wall time, CPU time, peak memory,
+exit reason and output size.
+The `__main__` rolls them up by project, module, operator and phase
+and lists the slowest pairs.
+
+The resources of builds sent to the Maven Daemon are the client's only.
+"""
+
+import argparse
+import json
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List
+
+import pandas as pd
+from effectiveness import settings
+from effectiveness.code_analysis.pom_module import CutPair
+from effectiveness.maven import ProcessUsage
+
+# phases of the jobs of a module
+TEST_COMPILE = 'test-compile'
+COVERAGE = 'coverage'
+PIT = 'pit'
+COPY = 'copy'
+
+
+class RunProfile:
+    def __init__(self, path: Path = settings.MUTATION_PROFILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+    def record(
+        self,
+        project: str,
+        commit: str,
+        module: str,
+        operator: str,
+        phase: str,
+        tests: List[CutPair],
+        usage: ProcessUsage,
+    ):
+        entry = {
+            'time': time.time(),
+            'project': project,
+            'commit': commit,
+            'module': module,
+            'operator': operator,
+            'phase': phase,
+            'test_name': ",".join(test.test_qualified_name for test in tests),
+            'class_name': ",".join(test.source_qualified_name for test in tests),
+            **usage._asdict(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path, 'a') as profile:
+            # a single write of a short line, so entries of other processes don't interleave
+            profile.write(json.dumps(entry) + "\n")
+
+
+@contextmanager
+def measure(on_usage) -> Iterator[None]:
+    """Records the wall and CPU time of the current thread for the duration of the block"""
+    started = time.monotonic()
+    before = resource.getrusage(resource.RUSAGE_THREAD)
+    exit_reason = "exception"
+    try:
+        yield
+        exit_reason = "exit 0"
+    finally:
+        after = resource.getrusage(resource.RUSAGE_THREAD)
+        cpu_time = (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime)
+        on_usage(ProcessUsage(time.monotonic() - started, cpu_time, 0, exit_reason, 0))
+
+
+def load_profile(path: Path = settings.MUTATION_PROFILE) -> pd.DataFrame:
+    frame = pd.read_json(path, lines=True, dtype={'module': str})
+    frame['module'] = frame['module'].fillna('')
+    return frame
+
+
+def rollup(frame: pd.DataFrame) -> pd.DataFrame:
+    """Totals by project, module, operator and phase, the most expensive first"""
+    totals = frame.groupby(['project', 'module', 'operator', 'phase']).agg(
+        jobs=('wall_time', 'size'),
+        wall_time=('wall_time', 'sum'),
+        cpu_time=('cpu_time', 'sum'),
+        max_rss=('max_rss', 'max'),
+        output_bytes=('output_bytes', 'sum'),
+    )
+    return totals.sort_values('wall_time', ascending=False)
+
+
+def slowest_pairs(frame: pd.DataFrame, top: int) -> pd.DataFrame:
+    runs = frame[frame['phase'] == PIT]
+    columns = ['project', 'module', 'operator', 'test_name', 'class_name']
+    return runs.nlargest(top, 'wall_time')[
+        columns + ['wall_time', 'cpu_time', 'max_rss', 'exit_reason']
+    ]
+
+
+if __name__ == '__main__':
+
+    def main():
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--profile", type=Path, default=settings.MUTATION_PROFILE)
+        parser.add_argument("--top", type=int, default=20, help="number of slowest pairs")
+        parser.add_argument("--output", type=Path, help="directory for the tables as csv")
+        args = parser.parse_args()
+
+        frame = load_profile(args.profile)
+        totals = rollup(frame)
+        phases = frame.groupby('phase')[['wall_time', 'cpu_time']].sum()
+        reasons = frame.groupby(['phase', 'exit_reason']).size().rename('jobs')
+        slowest = slowest_pairs(frame, args.top)
+
+        with pd.option_context(
+            'display.max_rows', None, 'display.max_columns', None, 'display.width', 200
+        ):
+            print("* Time by phase (s)")
+            print(phases.sort_values('wall_time', ascending=False))
+            print("* Exit reasons")
+            print(reasons)
+            print("* Time by project, module, operator and phase (s)")
+            print(totals)
+            print(f"* Slowest {args.top} pairs")
+            print(slowest.to_string(index=False))
+
+        if args.output is not None:
+            args.output.mkdir(parents=True, exist_ok=True)
+            totals.to_csv(args.output / 'profile_totals.csv')
+            slowest.to_csv(args.output / 'profile_slowest.csv', index=False)
+
+    main()
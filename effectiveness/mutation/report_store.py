@@ -0,0 +1,114 @@
+"""Putting PIT reports into the results tree without copying them.
+
+A report directory produced by PIT is renamed into place, or hardlinked when
+the source has to stay (e.g. a cache entry); only across filesystems is it copied.
+With `archive`, the report of a pair is instead packed into a single compressed
+`reports.zip`, which `open_latest` reads directly, to save inodes on shared storage.
+"""
+
+import os
+import shutil
+import threading
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import IO, Iterator, Optional
+
+# archive of the timestamped reports of a pair, inside its report directory
+REPORT_ARCHIVE = 'reports.zip'
+
+
+def _link_or_copy(source: str, destination: str):
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        os.unlink(destination)
+        os.link(source, destination)
+    except OSError:
+        # e.g. another filesystem
+        shutil.copy2(source, destination)
+
+
+def link_tree(source: Path, destination: Path):
+    """Copies a tree sharing the contents of its files with hardlinks"""
+    shutil.copytree(source, destination, copy_function=_link_or_copy, dirs_exist_ok=True)
+
+
+def move_tree(source: Path, destination: Path):
+    """Moves the contents of `source` into `destination`, replacing entries with the same name"""
+    destination.mkdir(parents=True, exist_ok=True)
+    for child in source.iterdir():
+        target = destination / child.name
+        if target.is_dir():
+            shutil.rmtree(target)
+        try:
+            os.replace(child, target)
+        except OSError:
+            shutil.move(child, target)
+    source.rmdir()
+
+
+def pack_tree(source: Path, archive: Path):
+    """Adds the files of `source` to a zip archive, replacing it atomically"""
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp_archive = archive.with_name(f".{archive.name}.{os.getpid()}.{threading.get_ident()}")
+    if archive.exists():
+        shutil.copy2(archive, tmp_archive)
+    try:
+        with zipfile.ZipFile(tmp_archive, 'a', zipfile.ZIP_DEFLATED) as packed:
+            for file in sorted(source.rglob('*')):
+                if file.is_file():
+                    packed.write(file, file.relative_to(source).as_posix())
+        os.replace(tmp_archive, archive)
+    finally:
+        if tmp_archive.exists():
+            tmp_archive.unlink()
+
+
+class ReportStore:
+    def __init__(self, archive: bool = False):
+        """
+        :param archive: pack every pair report into a zip instead of keeping its files
+        """
+        self.archive = archive
+
+    def put(self, source: Path, report_dir: Path, *, keep_source: bool = False):
+        """Puts the timestamped reports in `source` into the report directory of a pair
+
+        :param keep_source: leave `source` as it is, it's consumed otherwise
+        """
+        if self.archive:
+            pack_tree(source, report_dir / REPORT_ARCHIVE)
+            if not keep_source:
+                shutil.rmtree(source)
+        elif keep_source:
+            link_tree(source, report_dir)
+        else:
+            move_tree(source, report_dir)
+
+
+@contextmanager
+def open_latest(report_dir: Path, file_name: str) -> Iterator[Optional[IO[bytes]]]:
+    """The most recent `<timestamp>/<file_name>` of a pair, from its directory or its archive
+
+    Report directories are timestamps, so the most recent is alphabetically last.
+    """
+    files = sorted(report_dir.glob(f'*/{file_name}'))
+    archive = report_dir / REPORT_ARCHIVE
+    if files:
+        with open(files[-1], 'rb') as report:
+            yield report
+    elif archive.exists():
+        with zipfile.ZipFile(archive) as packed:
+            names = sorted(
+                name
+                for name in packed.namelist()
+                if len(PurePosixPath(name).parts) == 2 and PurePosixPath(name).name == file_name
+            )
+            if names:
+                with packed.open(names[-1]) as report:
+                    yield report
+            else:
+                yield None
+    else:
+        yield None
@@ -2,39 +2,215 @@
 parses the results and saves them in convenient format.
 """
 
+import argparse
+import math
 import re
 import shutil
-import subprocess
-import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import ContextManager, List, Optional, Set, Tuple
 
 import pandas as pd
 from effectiveness import settings
 from effectiveness.code_analysis.get_commit import get_last_commit_id
 from effectiveness.code_analysis.pom_module import CutPair, PomModule
 from effectiveness.code_analysis.scan_project import load_cut_pairs, search_project_tests
-from effectiveness.mutation.pom_changer import add_pitest_plugin
-from effectiveness.mutation.utils import get_projects
+from effectiveness.maven import MavenExecutor, UsageCallback, get_maven_executor
+from effectiveness.mutation import journal
+from effectiveness.mutation.cache import MutationCache
+from effectiveness.mutation.coverage import covered_classes, run_module_coverage, split_uncovered
+from effectiveness.mutation.history import PitHistoryStore
+from effectiveness.mutation.journal import MutationJournal
+from effectiveness.mutation.kill_matrix import store_kill_matrix
+from effectiveness.mutation import profile
+from effectiveness.mutation.planner import plan_project, print_plan
+from effectiveness.mutation.pom_changer import (
+    add_pitest_plugin,
+    full_mutation_matrix_supported,
+    pitest_properties,
+)
+from effectiveness.mutation.profile import RunProfile, measure
+from effectiveness.mutation.pitest_html_parser import PitestHTMLParser
+from effectiveness.mutation.report_store import ReportStore, open_latest
+from effectiveness.mutation.sampling import (
+    SAMPLING_REPORT,
+    MethodSampler,
+    estimate,
+    excluded_methods,
+    method_names,
+)
+from effectiveness.mutation.scheduler import schedule
+from effectiveness.mutation.utils import expand_operator, get_projects, listed_operator
+from effectiveness.mutation.worktrees import WorktreePool
+from effectiveness.resources import mutation_allotment
 from effectiveness.utils import clear_dir
 
 
-def main(projects: List[str], operator: str):
+@dataclass
+class MutationOptions:
+    # maximum number of PIT runs at the same time, and threads of each of them,
+    # None to share the CPU budget between them
+    workers: Optional[int] = settings.MUTATION_WORKERS
+    pit_threads: Optional[int] = None
+    # reports reused when the sources didn't change, None to always run PIT
+    cache: Optional[MutationCache] = field(default_factory=MutationCache)
+    # progress of the jobs, None to keep no record
+    journal: Optional[MutationJournal] = field(default_factory=MutationJournal)
+    # PIT history of every pair, to analyse only the mutants of changed code, None to disable
+    history: Optional[PitHistoryStore] = field(default_factory=PitHistoryStore)
+    # resources used by every process, None to keep no record
+    profile: Optional[RunProfile] = field(default_factory=RunProfile)
+    # how reports are put into the results, `ReportStore(archive=True)` zips those of every pair
+    reports: ReportStore = field(default_factory=ReportStore)
+    # keep previous results and skip the jobs the journal knows as finished
+    resume: bool = False
+    # report formats written by PIT for single pairs, HTML is always one of them:
+    # `calculate_results` takes the line coverage of the CUT from `index.html`
+    output_formats: str = "HTML"
+    # pass the single operators of a group to PIT instead of the group name,
+    # so that the mutants of every operator can be told apart in `mutations.xml`
+    expand_groups: bool = False
+    # run the tests of every module with JaCoCo first, and skip the pairs whose CUT isn't covered
+    skip_uncovered: bool = False
+    # fraction of the CUT methods mutated in every round of a sampled run, None to mutate them all
+    sample_fraction: Optional[float] = None
+    # sampled runs stop when the confidence interval of the mutation score is narrower than this
+    sample_ci_width: float = settings.SAMPLING_CI_WIDTH
+    maven: MavenExecutor = field(default_factory=get_maven_executor)
+
+    def __post_init__(self):
+        formats = [f.strip().upper() for f in self.output_formats.split(",") if f.strip()]
+        self.output_formats = ",".join(["HTML"] + [f for f in formats if f != "HTML"])
+        allotment = mutation_allotment(self.workers)
+        self.workers = allotment.workers
+        if self.pit_threads is None:
+            self.pit_threads = allotment.threads
+
+
+@dataclass
+class ModuleRun:
+    """The module being mutated, shared by all its jobs"""
+
+    project: str
+    commit: str
+    module: str
+    # module directory relative to the project root
+    module_dir: Path
+    results_path: Path
+    mutation_logs: Path
+    operator: str
+    options: MutationOptions
+    # copies of the project made before the tests of this module were compiled
+    stale_worktrees: Set[Path] = field(default_factory=set)
+
+    def report_dir(self, test: CutPair) -> Path:
+        return self.results_path / f"{test.test_qualified_name}({self.module})"
+
+    @property
+    def mutators(self) -> List[str]:
+        if self.options.expand_groups:
+            return expand_operator(self.operator)
+        return [self.operator]
+
+    @property
+    def output_formats(self) -> str:
+        # sampled reports are estimated from `mutations.xml`, with the line coverage of the HTML
+        if self.options.sample_fraction:
+            return "HTML,XML"
+        return self.options.output_formats
+
+    @property
+    def full_mutation_matrix(self) -> bool:
+        """Whether `mutations.xml` lists every test killing a mutant, for the kill matrix"""
+        return "XML" in self.output_formats.split(",") and full_mutation_matrix_supported()
+
+    @property
+    def reports(self) -> ReportStore:
+        # sampled runs are read from their `sampling.json`, which must stay a plain file
+        if self.options.sample_fraction:
+            return ReportStore()
+        return self.options.reports
+
+    def cache_key(self, test: CutPair) -> str:
+        variant = [self.output_formats, ",".join(self.mutators)]
+        if self.full_mutation_matrix:
+            variant.append("full-matrix")
+        if self.options.sample_fraction:
+            variant.append(f"sample={self.options.sample_fraction},{self.options.sample_ci_width}")
+        return MutationCache.key(test, self.operator, *variant)
+
+    def history(self, test: CutPair) -> ContextManager[Tuple[Optional[Path], Optional[Path]]]:
+        if self.options.history is None:
+            return nullcontext((None, None))
+        return self.options.history.use(self.project, self.module, self.operator, test)
+
+    def on_usage(self, phase: str, tests: List[CutPair] = ()) -> Optional[UsageCallback]:
+        """Records the resources used by a process of the given phase in the profile"""
+        if self.options.profile is None:
+            return None
+        return partial(
+            self.options.profile.record,
+            self.project,
+            self.commit,
+            self.module,
+            self.operator,
+            phase,
+            list(tests),
+        )
+
+    def measure(self, phase: str, tests: List[CutPair] = ()) -> ContextManager[None]:
+        """Records the resources used by the current thread in the block"""
+        on_usage = self.on_usage(phase, tests)
+        return nullcontext() if on_usage is None else measure(on_usage)
+
+    def refresh(self, worktree: Path):
+        """Compiles the tests of the module in a copy made before they were"""
+        if worktree not in self.stale_worktrees:
+            return
+        print(f"* * * Compiling tests in {worktree}")
+        compile_tests(
+            self.options.maven,
+            worktree,
+            self.module,
+            self.mutation_logs,
+            self.on_usage(profile.TEST_COMPILE),
+        )
+        self.stale_worktrees.discard(worktree)
+
+    def mark(self, tests: List[CutPair], status: str, message: str = None):
+        if self.options.journal is None:
+            return
+        for test in tests:
+            self.options.journal.mark(
+                self.project, self.commit, self.module, test, self.operator, status, message
+            )
+
+
+def main(projects: List[str], operator: str, options: MutationOptions = None):
+    options = options or MutationOptions()
+
     # deal with directories
     settings.RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
-    clear_dir(settings.MUTATION_RESULTS_DIR)
+    if not options.resume:
+        clear_dir(settings.MUTATION_RESULTS_DIR)
+        clear_dir(settings.LOGS_DIR)
+        if options.journal is not None:
+            options.journal.reset()
+        if options.profile is not None:
+            options.profile.clear()
     settings.MUTATION_RESULTS_DIR.mkdir(parents=True, exist_ok=True)
-
-    clear_dir(settings.LOGS_DIR)
     settings.LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
     for i, project in enumerate(projects):
         print(f"* Running mutations for project {project} ({i + 1}/{len(projects)})")
-        run_project_mutations(project, operator)
+        run_project_mutations(project, operator, options)
 
 
-def run_project_mutations(project: str, operator: str):
+def run_project_mutations(project: str, operator: str, options: MutationOptions):
     # TODO: more logging
     project_path = settings.PROJECTS_DIR / project
     current_commit = get_last_commit_id(project_path)
@@ -45,131 +221,498 @@ def run_project_mutations(project: str, operator: str):
     results_path = settings.MUTATION_RESULTS_DIR / project / current_commit / operator
     results_path.mkdir(parents=True, exist_ok=True)
 
-    for module_cuts in cuts_path.glob("tests_*.csv"):
-        loaded = load_cut_pairs(module_cuts)
-        if loaded is None:
-            continue
+    # every worker mutates its own copy of the project, compiled classes included,
+    # the copies are made once and reused by all the modules
+    with WorktreePool(project_path, options.workers, prepare=prepare_worktree) as pool:
+        for module_cuts in cuts_path.glob("tests_*.csv"):
+            loaded = load_cut_pairs(module_cuts)
+            if loaded is None:
+                continue
+
+            loaded_project, module, cut_tests = loaded
+            assert loaded_project == project
 
-        loaded_project, module, cut_tests = loaded
-        assert loaded_project == project
+            if module:
+                module_path = project_path / module
+            else:
+                module_path = project_path
 
-        if module:
-            module_path = project_path / module
-        else:
-            module_path = project_path
-
-        run_module_mutations(
-            project,
-            module,
-            project_path,
-            module_path,
-            results_path,
-            cut_tests,
-            operator,
-        )
+            run_module_mutations(
+                project,
+                current_commit,
+                module,
+                project_path,
+                module_path,
+                results_path,
+                cut_tests,
+                operator,
+                options,
+                pool,
+            )
+
+    # sampled runs only mutate some of the methods, their reports aren't kept per pair
+    if "XML" in options.output_formats.split(",") and not options.sample_fraction:
+        path = store_kill_matrix(project, current_commit, operator)
+        print(f"* Saved kill matrix of {project} {operator} to {path}")
 
 
 def run_module_mutations(
     project: str,
+    commit: str,
     module: str,
     project_path: Path,
     module_path: Path,
     results_path: Path,
     cut_tests: List[CutPair],
     operator: str,
+    options: MutationOptions,
+    pool: WorktreePool,
 ):
     print(f"* * Running mutations for module {module}")
-    pom = project_path / "pom.xml"
-    cached_pom = pom.with_name("~pom_cached.xml")
-    print("* * Caching original pom")
-    shutil.copy2(pom, cached_pom)
-    target = module_path / 'target'
 
     mutation_logs = settings.LOGS_DIR / project
     mutation_logs.mkdir(parents=True, exist_ok=True)
 
+    run = ModuleRun(
+        project,
+        commit,
+        module,
+        module_path.relative_to(project_path),
+        results_path,
+        mutation_logs,
+        operator,
+        options,
+    )
+
+    # all the pairs of the module, before leaving out the ones that don't need PIT
+    module_tests = cut_tests
+
+    if options.journal is not None:
+        options.journal.add_pending(project, commit, module, cut_tests, operator)
+        if options.resume:
+            finished = options.journal.finished_pairs(project, commit, module, operator)
+            cut_tests = [test for test in cut_tests if test.key not in finished]
+            print(f"* * Resuming with {len(cut_tests)} unfinished pairs")
+
+    if options.cache is not None:
+        cut_tests = restore_cached_reports(run, cut_tests)
+
+    if not cut_tests:
+        print("* * Nothing left to mutate")
+        return
+
+    # PIT requires test files to be compiled, new copies of the project get them from here
+    print("* * Compiling tests")
+    compile_tests(
+        options.maven, project_path, module, mutation_logs, run.on_usage(profile.TEST_COMPILE)
+    )
+    run.stale_worktrees = set(pool.worktrees)
+
+    if options.skip_uncovered:
+        cut_tests = skip_uncovered_pairs(run, project_path, module_path, cut_tests)
+        if not cut_tests:
+            print("* * No covered class left to mutate")
+            return
+
+    if options.history is not None:
+        # cached, resumed and skipped pairs still need their history for the next commit
+        options.history.prune(project, module, operator, module_tests)
+
+    # longest jobs first, so that the workers finish at about the same time
+    history = options.journal.durations(project, operator) if options.journal is not None else {}
+    jobs = schedule(module, cut_tests, history)
+
+    workers = max(1, min(options.workers, len(jobs)))
+    with ThreadPoolExecutor(workers) as executor:
+        run_pair = run_sampled_pair_mutations if options.sample_fraction else run_pair_mutations
+        futures = [executor.submit(run_pair, pool, run, job.pair, job.timeout) for job in jobs]
+        for future in futures:
+            future.result()
+
+
+def restore_cached_reports(run: ModuleRun, cut_tests: List[CutPair]) -> List[CutPair]:
+    """Links cached reports into the results, returns the pairs that still need to run"""
+    missing = []
+    for test in cut_tests:
+        entry = run.options.cache.get(run.cache_key(test))
+        if entry is not None:
+            run.reports.put(entry, run.report_dir(test), keep_source=True)
+            print(f"* * * Cached result for {test.source_qualified_name}")
+            run.mark([test], journal.DONE, "cached")
+        else:
+            missing.append(test)
+    return missing
+
+
+def skip_uncovered_pairs(
+    run: ModuleRun, project_path: Path, module_path: Path, cut_tests: List[CutPair]
+) -> List[CutPair]:
+    """Marks the pairs whose CUT isn't covered by the module tests, returns the other ones"""
+    print("* * Running tests with coverage")
+    report = run_module_coverage(
+        run.options.maven,
+        project_path,
+        run.module,
+        module_path,
+        run.mutation_logs / f"mvn-coverage({run.module}).txt",
+        on_usage=run.on_usage(profile.COVERAGE),
+    )
+    if report is None:
+        print("* * No coverage report, mutating all pairs")
+        return cut_tests
+
+    kept, skipped = split_uncovered(cut_tests, covered_classes(report))
+    print(f"* * Skipping {len(skipped)} pairs without coverage")
+    run.mark(skipped, journal.SKIPPED, "no coverage")
+    return kept
+
+
+def module_projects_list(module: str) -> List[str]:
     if module:
-        pl = ["--projects", module]
+        return ["--projects", module]
     else:
-        pl = []
+        return []
 
-    # PIT requires test files to be compiled
-    print("* * Compiling tests")
-    subprocess.run(
+
+def compile_tests(
+    maven: MavenExecutor,
+    project_path: Path,
+    module: str,
+    mutation_logs: Path,
+    on_usage: Optional[UsageCallback] = None,
+):
+    maven.run(
         [
-            "mvn",
             "test-compile",
             "--also-make",
             "--update-snapshots",
             "--errors",
-            *pl,
-            "--log-file",
-            mutation_logs / f"mvn-test-compile({module}).txt",
+            *module_projects_list(module),
         ],
         cwd=project_path,
+        log_file=mutation_logs / f"mvn-test-compile({module}).txt",
         check=True,
+        on_usage=on_usage,
     )
 
-    try:
-        for test in cut_tests:
-            add_pitest_plugin(
-                cached_pom,
-                pom,
-                class_to_mutate=test.source_qualified_name,
-                test_to_run=test.test_qualified_name,
-                mutator=operator,
-            )
-            print(f"* * * Mutating {test.source_qualified_name} with operator {operator}")
-            try:
-                subprocess.run(
-                    [
-                        "mvn",
-                        "org.pitest:pitest-maven:mutationCoverage",
-                        *pl,
-                        "-X",
-                        "-DoutputFormats=HTML",
-                        "--log-file",
-                        mutation_logs / f"{test.test_qualified_name}({module}).txt",
-                    ],
-                    cwd=project_path,
-                    timeout=settings.MUTATION_TIMEOUT,
-                    check=True,
+
+def prepare_worktree(worktree: Path):
+    # the PIT plugin goes in once, the parameters of every run are given on the command line
+    pom = worktree / "pom.xml"
+    add_pitest_plugin(pom, pom)
+
+
+NO_MUTATIONS = "No mutations found"
+
+# output of PIT runs that can't produce a report, stopped as soon as it's printed
+PIT_FATAL_OUTPUT = re.compile(
+    "|".join(
+        [
+            re.escape("BUILD FAILURE"),
+            re.escape(NO_MUTATIONS),
+            # tests failing without mutations (red suite)
+            re.escape("Tests failing without mutation"),
+            re.escape("requires a green suite"),
+            # OOM of Maven itself, PIT minions running out of memory only give MEMORY_ERROR mutants
+            r"^(?!\s*(?:stdout|stderr)\s*:).*java\.lang\.OutOfMemoryError",
+        ]
+    )
+)
+
+
+def run_pitest(
+    maven: MavenExecutor,
+    worktree: Path,
+    module: str,
+    log_file: Path,
+    *,
+    classes_to_mutate: List[str],
+    tests_to_run: List[str],
+    mutators: List[str],
+    output_formats: str = "HTML",
+    full_mutation_matrix: bool = False,
+    excluded_methods: List[str] = (),
+    history: Tuple[Optional[Path], Optional[Path]] = (None, None),
+    threads: int = 4,
+    timeout: float = settings.MUTATION_TIMEOUT,
+    on_usage: Optional[UsageCallback] = None,
+) -> Tuple[str, Optional[str]]:
+    """Run PIT in the worktree
+
+    :param history: PIT history input and output files
+
+    Returns:
+        the final job status and an optional message
+    """
+    result = maven.stream(
+        [
+            "org.pitest:pitest-maven:mutationCoverage",
+            *module_projects_list(module),
+            *pitest_properties(
+                classes_to_mutate,
+                tests_to_run,
+                mutators,
+                threads=threads,
+                full_mutation_matrix=full_mutation_matrix,
+                excluded_methods=excluded_methods,
+                history_input=history[0],
+                history_output=history[1],
+            ),
+            f"-DoutputFormats={output_formats}",
+        ],
+        cwd=worktree,
+        log_file=log_file,
+        timeout=timeout,
+        fatal=PIT_FATAL_OUTPUT,
+        on_usage=on_usage,
+    )
+    if result.timed_out:
+        message = f"PIT timed out after {timeout:.0f} seconds"
+        print(message)
+        return journal.TIMED_OUT, message
+    if result.fatal_line is not None and NO_MUTATIONS in result.fatal_line:
+        return journal.SKIPPED, "no mutations"
+    if not result.ok:
+        # Sometimes we find tests that are excluded from the suite
+        # e.g. when dealing with `AllTests`,
+        # leave the results out when they don't pass.
+        # Exit status doesn't change when the test doesn't pass
+        # or something more severe happens, so ignore all failures.
+        message = result.fatal_line or f"PIT exited with status {result.returncode}"
+        print(message)
+        return journal.FAILED, message
+    return journal.DONE, None
+
+
+def run_pair_mutations(
+    pool: WorktreePool, run: ModuleRun, test: CutPair, timeout: float = settings.MUTATION_TIMEOUT
+):
+    with pool.checkout() as worktree:
+        run.refresh(worktree)
+        target = worktree / run.module_dir / 'target'
+
+        print(f"* * * Mutating {test.source_qualified_name} with operator {run.operator}")
+        run.mark([test], journal.RUNNING)
+        try:
+            with run.history(test) as history:
+                status, message = run_pitest(
+                    run.options.maven,
+                    worktree,
+                    run.module,
+                    run.mutation_logs / f"{test.test_qualified_name}({run.module}).txt",
+                    classes_to_mutate=[test.source_qualified_name],
+                    tests_to_run=[test.test_qualified_name],
+                    mutators=run.mutators,
+                    output_formats=run.output_formats,
+                    full_mutation_matrix=run.full_mutation_matrix,
+                    history=history,
+                    threads=run.options.pit_threads,
+                    timeout=timeout,
+                    on_usage=run.on_usage(profile.PIT, [test]),
                 )
-            except subprocess.CalledProcessError as cpe:
-                # Sometimes we find tests that are excluded from the suite
-                # e.g. when dealing with `AllTests`,
-                # leave the results out when they don't pass.
-                # Exit status doesn't change when the test doesn't pass
-                # or something more severe happens, so ignore all failures.
-                # TODO?: something better
-                print(cpe)
-                continue
-            except subprocess.TimeoutExpired as te:
-                print(te)
-                continue
+            if status != journal.DONE:
+                run.mark([test], status, message)
+                return
 
-            tmp_target_dir = target / f"{test.test_qualified_name}({module})"
-            if tmp_target_dir.exists():
-                shutil.rmtree(tmp_target_dir)
-            shutil.move(target / 'pit-reports', tmp_target_dir)
-            shutil.copytree(
-                tmp_target_dir, results_path / tmp_target_dir.name, dirs_exist_ok=True
-            )
-    finally:
-        print("* * Restoring pom.xml")
-        pom.unlink()
-        cached_pom.rename(pom)
+            with run.measure(profile.COPY, [test]):
+                tmp_target_dir = target / f"{test.test_qualified_name}({run.module})"
+                if tmp_target_dir.exists():
+                    shutil.rmtree(tmp_target_dir)
+                shutil.move(target / 'pit-reports', tmp_target_dir)
+                if run.options.cache is not None:
+                    run.options.cache.store(run.cache_key(test), tmp_target_dir)
+                run.reports.put(tmp_target_dir, run.report_dir(test))
+        except Exception as e:
+            run.mark([test], journal.FAILED, repr(e))
+            raise
+        run.mark([test], journal.DONE)
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("* Wrong usage!")
-        print(f"* Usage: {sys.argv[0]} <csv_file_with_project_list.csv> [<operator>]")
-        exit(1)
+def run_sampled_pair_mutations(
+    pool: WorktreePool, run: ModuleRun, test: CutPair, timeout: float = settings.MUTATION_TIMEOUT
+):
+    """Mutate random rounds of CUT methods until the mutation score is known closely enough
 
-    projects_csv = sys.argv[1]
-    projects = get_projects(projects_csv)
+    The reports of the rounds are kept under `sampling/`, the estimate in `sampling.json`.
+    """
+    with pool.checkout() as worktree:
+        run.refresh(worktree)
+        target = worktree / run.module_dir / 'target'
+        report_dir = run.report_dir(test)
+        sampler = MethodSampler(
+            method_names(test.source_path),
+            run.options.sample_fraction,
+            seed=f"{test.test_qualified_name}:{test.source_qualified_name}",
+        )
+
+        print(f"* * * Sampling {test.source_qualified_name} with operator {run.operator}")
+        run.mark([test], journal.RUNNING)
+        try:
+            clusters = {}
+            line_coverage = float("NaN")
+            round_index = 0
+            while sampler:
+                selected = sampler.next_round()
+                status, message = run_pitest(
+                    run.options.maven,
+                    worktree,
+                    run.module,
+                    run.mutation_logs / f"{test.test_qualified_name}({run.module}).txt",
+                    classes_to_mutate=[test.source_qualified_name],
+                    tests_to_run=[test.test_qualified_name],
+                    mutators=run.mutators,
+                    output_formats=run.output_formats,
+                    excluded_methods=excluded_methods(sorted(sampler.known - set(selected))),
+                    threads=run.options.pit_threads,
+                    timeout=timeout,
+                    on_usage=run.on_usage(profile.PIT, [test]),
+                )
+                if status != journal.DONE:
+                    run.mark([test], status, message)
+                    return
+
+                round_dir = report_dir / 'sampling' / f"round-{round_index}"
+                with run.measure(profile.COPY, [test]):
+                    if round_dir.exists():
+                        shutil.rmtree(round_dir)
+                    shutil.move(target / 'pit-reports', round_dir)
+                round_index += 1
+
+                for report in round_dir.glob('*/mutations.xml'):
+                    clusters.update(sampler.read_round(report, selected))
+                if math.isnan(line_coverage):
+                    # the HTML report lists no class when the round has no mutant
+                    with open_latest(round_dir, 'index.html') as report:
+                        parsed = PitestHTMLParser.parse(report) if report else None
+                    if parsed is not None and parsed.line_coverage is not None:
+                        line_coverage = parsed.line_coverage
+
+                sampling = estimate(clusters, len(sampler.known), line_coverage)
+                sampling.save(report_dir / SAMPLING_REPORT)
+                print(
+                    f"* * * * {test.source_qualified_name}: {sampling.mutation_score:.3f} "
+                    f"[{sampling.ci_low:.3f}, {sampling.ci_high:.3f}] "
+                    f"from {sampling.sampled_methods}/{sampling.methods} methods"
+                )
+                if sampling.ci_width < run.options.sample_ci_width:
+                    break
+
+            if run.options.cache is not None:
+                run.options.cache.store(run.cache_key(test), report_dir)
+        except Exception as e:
+            run.mark([test], journal.FAILED, repr(e))
+            raise
+        run.mark([test], journal.DONE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("projects_csv", help="csv file with project list")
+    parser.add_argument("operator", nargs="?", default="ALL")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.MUTATION_WORKERS,
+        help="maximum number of CUT/test pairs mutated at the same time, "
+        "by default as many as the CPU budget allows with 4 PIT threads each",
+    )
+    parser.add_argument(
+        "--pit-threads",
+        type=int,
+        help="threads of every PIT run, by default the CPU budget shared by the workers",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always run PIT, even for pairs whose sources didn't change",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="start a new Maven JVM for every command even if mvnd is installed",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="analyse every mutant again instead of reusing PIT history of unchanged classes",
+    )
+    parser.add_argument(
+        "--archive-reports",
+        action="store_true",
+        help="keep the reports of every pair in a single compressed reports.zip",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="keep previous results and run again the pairs that didn't finish, and the failed "
+        "and timed out ones that have attempts left",
+    )
+    parser.add_argument(
+        "--output-formats",
+        default="HTML",
+        help="comma separated PIT report formats, HTML is always written for the line coverage",
+    )
+    parser.add_argument(
+        "--skip-uncovered",
+        action="store_true",
+        help="run the tests of every module with JaCoCo first and don't mutate the classes "
+        "they don't cover",
+    )
+    parser.add_argument(
+        "--sample",
+        type=float,
+        metavar="FRACTION",
+        help="estimate the mutation scores by mutating random rounds of the CUT methods, "
+        "FRACTION of them first and twice as many every round, until the confidence interval "
+        "is narrower than --sample-ci-width or after settings.SAMPLING_MAX_ROUNDS rounds",
+    )
+    parser.add_argument(
+        "--sample-ci-width",
+        type=float,
+        default=settings.SAMPLING_CI_WIDTH,
+        help="width of the confidence interval at which sampled runs stop",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="scan the projects and print the projected PIT time of the run, without running it",
+    )
+    parser.add_argument(
+        "--derivable",
+        action="store_true",
+        help="run the single operators of the group with XML output, "
+        "so that calculate_results.py --derive-from can score every operator from this run; "
+        "the results of a group go under <group>_LISTED, as PIT's group may have other mutators",
+    )
+    args = parser.parse_args()
 
-    operator = sys.argv[2] if len(sys.argv) >= 3 else "ALL"
+    projects = get_projects(args.projects_csv)
 
-    main(projects, operator)
+    options = MutationOptions(
+        workers=args.workers,
+        pit_threads=args.pit_threads,
+        cache=None if args.no_cache else MutationCache(),
+        history=None if args.no_history else PitHistoryStore(),
+        reports=ReportStore(archive=args.archive_reports),
+        resume=args.resume,
+        output_formats=args.output_formats,
+        skip_uncovered=args.skip_uncovered,
+        sample_fraction=args.sample,
+        sample_ci_width=args.sample_ci_width,
+        maven=get_maven_executor(use_daemon=not args.no_daemon),
+    )
+    operator = args.operator
+    if args.derivable:
+        if "XML" not in options.output_formats:
+            options.output_formats += ",XML"
+        options.expand_groups = True
+        operator = listed_operator(args.operator)
+    if args.plan:
+        plans = [
+            plan
+            for project in projects
+            for plan in plan_project(project, operator, options.workers, options.journal)
+        ]
+        print_plan(plans, operator, options.workers, options.pit_threads)
+    else:
+        main(projects, operator, options)
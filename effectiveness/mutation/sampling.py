@@ -0,0 +1,192 @@
+"""Estimating the mutation score of a pair from a random sample of its mutants.
+
+PIT can't pick single mutants, but it can leave methods out (`excludedMethods`),
+so the sampling unit is a method of the CUT with all its mutants: a cluster.
+Every sampled method is mutated by all the operators, so every operator
+is represented in proportion to the mutants it creates in the class.
+
+Rounds of randomly chosen methods run until the confidence interval
+of the ratio estimator is narrower than the requested width,
+or until all the methods have been mutated, which gives the exact score.
+Every round is a whole PIT run, so each round mutates twice as many methods
+as the previous one, and there are at most `settings.SAMPLING_MAX_ROUNDS` of them.
+
+The line coverage of the CUT doesn't depend on the methods left out:
+it's read from the `index.html` of the rounds, not estimated from the mutants.
+"""
+
+import json
+import math
+import random
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+from effectiveness import settings
+from effectiveness.mutation.pitest_html_parser import ParserOutput
+from effectiveness.mutation.pitest_xml_parser import PitestXMLParser
+
+# summary written in the report directory of a sampled pair
+SAMPLING_REPORT = 'sampling.json'
+
+METHOD_PATTERN = re.compile(
+    r"^\s*(?:(?:public|protected|private|static|final|synchronized|abstract|native|strictfp)\s+)*"
+    r"(?:<[^>]*>\s*)?[\w$.<>\[\],? ]+?\s+(\w+)\s*\([^;{]*\)\s*(?:throws\s+[\w$.,\s]+)?\{",
+    re.MULTILINE,
+)
+LAMBDA_PATTERN = re.compile(r"^lambda\$(\w+)\$\d+$")
+KEYWORDS = {'if', 'for', 'while', 'switch', 'catch', 'synchronized', 'return', 'new', 'else'}
+
+
+def method_names(source: Path) -> List[str]:
+    """Names of the methods declared in a Java source, constructors and initializers included"""
+    source = Path(source)
+    # constructors are all `<init>` for PIT
+    ignored = KEYWORDS | {source.stem}
+    names = set(METHOD_PATTERN.findall(source.read_text(errors='replace'))) - ignored
+    return sorted(names) + ['<init>', '<clinit>']
+
+
+def cluster_of(method: str) -> str:
+    """The declared method containing a mutated method, e.g. a lambda"""
+    match = LAMBDA_PATTERN.match(method)
+    return match[1] if match else method
+
+
+def excluded_methods(methods: List[str]) -> List[str]:
+    """`excludedMethods` globs leaving out the methods and their lambdas"""
+    return [glob for method in methods for glob in (method, f"lambda${method}$*")]
+
+
+@dataclass
+class Cluster:
+    mutants: int = 0
+    detected: int = 0
+
+
+@dataclass
+class SamplingReport:
+    # estimated number of mutants of the whole class
+    total_mutants: int
+    mutation_score: float
+    ci_low: float
+    ci_high: float
+    line_coverage: float
+    sampled_methods: int
+    methods: int
+    sampled_mutants: int
+    clusters: Dict[str, Cluster] = field(default_factory=dict)
+
+    @property
+    def ci_width(self) -> float:
+        return self.ci_high - self.ci_low
+
+    def save(self, path: Path):
+        path.write_text(json.dumps(asdict(self), indent=2))
+
+    @classmethod
+    def load(cls, path: Path) -> 'SamplingReport':
+        data = json.loads(path.read_text())
+        data['clusters'] = {
+            name: Cluster(c['mutants'], c['detected']) for name, c in data['clusters'].items()
+        }
+        return cls(**data)
+
+    def parser_output(self) -> ParserOutput:
+        return ParserOutput(
+            self.total_mutants, self.mutation_score, self.line_coverage, self.ci_low, self.ci_high
+        )
+
+
+def estimate(
+    clusters: Dict[str, Cluster],
+    methods: int,
+    line_coverage: float = float("NaN"),
+    confidence: float = settings.SAMPLING_CONFIDENCE,
+) -> SamplingReport:
+    """Ratio estimate of the mutation score from a simple random sample of clusters
+
+    :param methods: number of clusters in the class, sampled or not
+    :param line_coverage: line coverage of the CUT by the test, from PIT's HTML report
+    """
+    n = len(clusters)
+    mutants = sum(c.mutants for c in clusters.values())
+    detected = sum(c.detected for c in clusters.values())
+    score = detected / mutants if mutants > 0 else float("NaN")
+
+    if n >= methods or mutants == 0:
+        ci_low = ci_high = score
+    elif n < 2:
+        ci_low, ci_high = 0.0, 1.0
+    else:
+        mean_mutants = mutants / n
+        residuals = sum((c.detected - score * c.mutants) ** 2 for c in clusters.values())
+        variance = (1 - n / methods) * residuals / (n - 1) / (n * mean_mutants ** 2)
+        half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(variance)
+        ci_low, ci_high = max(0.0, score - half_width), min(1.0, score + half_width)
+
+    return SamplingReport(
+        total_mutants=round(mutants * methods / n) if n else 0,
+        mutation_score=score,
+        ci_low=ci_low,
+        ci_high=ci_high,
+        line_coverage=line_coverage,
+        sampled_methods=n,
+        methods=methods,
+        sampled_mutants=mutants,
+        clusters=clusters,
+    )
+
+
+class MethodSampler:
+    """Draws rounds of methods without replacement
+
+    Methods found only in the reports (e.g. missed by `method_names`)
+    join the ones still to be drawn.
+    """
+
+    def __init__(self, methods: List[str], fraction: float, seed: str):
+        self.known = set(methods)
+        self._random = random.Random(seed)
+        self._remaining = list(methods)
+        self._random.shuffle(self._remaining)
+        self.round_size = max(2, math.ceil(fraction * len(methods)))
+        self.rounds = 0
+
+    def __bool__(self):
+        return bool(self._remaining) and self.rounds < settings.SAMPLING_MAX_ROUNDS
+
+    def next_round(self) -> List[str]:
+        selected = self._remaining[: self.round_size]
+        del self._remaining[: self.round_size]
+        self.rounds += 1
+        self.round_size *= 2
+        return selected
+
+    def discover(self, method: str):
+        if method not in self.known:
+            self.known.add(method)
+            self._remaining.insert(self._random.randint(0, len(self._remaining)), method)
+
+    def read_round(self, report: Path, selected: List[str]) -> Dict[str, Cluster]:
+        """Clusters of the selected methods from the `mutations.xml` of a round"""
+        # methods without mutants are sampled clusters too
+        clusters = {method: Cluster() for method in selected}
+        for mutant in PitestXMLParser.iter_mutants(report):
+            method = cluster_of(mutant.method)
+            if method not in clusters:
+                # not excluded because it wasn't known
+                self.discover(method)
+                continue
+
+            cluster = clusters[method]
+            cluster.mutants += 1
+            cluster.detected += mutant.detected
+        return clusters
+
+
+def read_sampling_report(report_dir: Path) -> Optional[ParserOutput]:
+    path = report_dir / SAMPLING_REPORT
+    return SamplingReport.load(path).parser_output() if path.exists() else None
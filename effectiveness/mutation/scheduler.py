@@ -0,0 +1,117 @@
+"""Ordering and timeouts of the PIT runs of a module.
+
+The cost of a job is predicted from the durations of earlier runs of the same pairs,
+found in the journal, or else from the size of the CUT and of its test:
+the number of mutants grows with the CUT lines, and every mutant may run all the test methods.
+Pairs without history get the median seconds per unit of static cost of the project.
+Runs that timed out or failed only tell that the pair takes longer than they lasted:
+such a lower bound raises the prediction, so the next timeout grows from it.
+
+Jobs are dispatched longest first, so that large CUTs don't end up alone at the end of the run.
+Pairs with a recorded duration get a timeout proportional to their predicted duration,
+the others the global timeout.
+"""
+
+import re
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from effectiveness import settings
+from effectiveness.code_analysis.pom_module import CutPair
+from effectiveness.mutation.journal import Duration
+
+TEST_METHOD_PATTERN = re.compile(r"@Test\b|\bpublic\s+void\s+test\w*\s*\(")
+
+# (module, test_name, class_name) -> seconds
+History = Dict[Tuple[str, str, str], Duration]
+
+
+@dataclass
+class Job:
+    pair: CutPair
+    # predicted seconds, or static cost when there is no history at all
+    cost: float
+    # seconds
+    timeout: float
+
+
+def count_lines(path: Path) -> int:
+    """Non blank lines of a source file"""
+    try:
+        with open(path, errors='replace') as source:
+            return sum(1 for line in source if line.strip())
+    except OSError:
+        return 0
+
+
+def count_test_methods(path: Path) -> int:
+    try:
+        return len(TEST_METHOD_PATTERN.findall(Path(path).read_text(errors='replace')))
+    except OSError:
+        return 0
+
+
+def static_cost(pair: CutPair) -> float:
+    """Cost of mutating a pair in arbitrary units, from the sources alone"""
+    test_size = max(count_test_methods(pair.test_path), count_lines(pair.test_path) / 100, 1)
+    return max(count_lines(pair.source_path), 1) * test_size
+
+
+def pair_key(module: str, pair: CutPair) -> Tuple[str, str, str]:
+    return module, pair.test_qualified_name, pair.source_qualified_name
+
+
+def predict_durations(
+    module: str, pairs: List[CutPair], history: History
+) -> Dict[Tuple[str, str, str], float]:
+    """Predicted seconds of every pair, static costs when there's no history to learn from"""
+    costs = {pair_key(module, pair): static_cost(pair) for pair in pairs}
+    if not history:
+        return costs
+
+    known = {
+        key: history[key].seconds
+        for key in costs
+        if key in history and not history[key].lower_bound
+    }
+    if known:
+        # seconds per unit of cost of the pairs of this module
+        rate = statistics.median(duration / costs[key] for key, duration in known.items())
+    else:
+        exact = [duration.seconds for duration in history.values() if not duration.lower_bound]
+        seconds = exact or [duration.seconds for duration in history.values()]
+        rate = statistics.median(seconds) / statistics.median(costs.values())
+
+    predicted = {}
+    for key, cost in costs.items():
+        predicted[key] = known.get(key, rate * cost)
+        if key in history and history[key].lower_bound:
+            predicted[key] = max(predicted[key], history[key].seconds)
+    return predicted
+
+
+def job_timeout(predicted: Optional[float]) -> float:
+    """Predicted duration with a safety margin, the global timeout when unknown"""
+    if predicted is None:
+        return settings.MUTATION_TIMEOUT
+    timeout = predicted * settings.MUTATION_TIMEOUT_FACTOR + settings.MUTATION_TIMEOUT_MARGIN
+    return min(timeout, settings.MUTATION_TIMEOUT_MAX)
+
+
+def schedule(module: str, pairs: List[CutPair], history: History) -> List[Job]:
+    """Jobs for the pairs, the most expensive first
+
+    :param history: durations of earlier runs, see `MutationJournal.durations`
+    """
+    predicted = predict_durations(module, pairs, history)
+
+    jobs = []
+    for pair in pairs:
+        key = pair_key(module, pair)
+        # static costs are too rough a guess to cut a run short
+        timeout = job_timeout(predicted[key] if key in history else None)
+        jobs.append(Job(pair, predicted[key], timeout))
+
+    return sorted(jobs, key=lambda job: job.cost, reverse=True)
@@ -2,7 +2,25 @@ from pathlib import Path
 from typing import List
 
 import pandas as pd
+from effectiveness.settings import OPERATORS
 
 
 def get_projects(path: Path) -> List[str]:
     return pd.read_csv(path)['project'].str.split("/").str[1].unique().tolist()
+
+
+# suffix of a group made of the operators it has in `OPERATORS`, which PIT may define
+# with other mutators, e.g. PIT's ALL group has the experimental ones too
+LISTED_SUFFIX = "_LISTED"
+
+
+def listed_operator(operator: str) -> str:
+    """Name of the operators of a group passed to PIT one by one, the operator itself if single"""
+    return f"{operator}{LISTED_SUFFIX}" if operator in OPERATORS else operator
+
+
+def expand_operator(operator: str) -> List[str]:
+    """Returns the single PIT operators making up a group (or the operator itself)"""
+    if operator.endswith(LISTED_SUFFIX):
+        operator = operator[: -len(LISTED_SUFFIX)]
+    return OPERATORS.get(operator, [operator])
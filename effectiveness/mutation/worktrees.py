@@ -0,0 +1,111 @@
+"""Isolated copies of a project, so that several PIT runs can mutate it at once.
+
+A pool lasts as long as the run of a project, its copies are reused by all the modules.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+from effectiveness import settings
+
+
+def copy_project(source: Path, destination: Path):
+    """Copy the whole project tree, sharing file contents when the filesystem allows it
+
+    A plain copy (instead of `git worktree`) keeps uncommitted patches
+    and the already compiled `target/` directories.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if shutil.which("cp"):
+        subprocess.run(
+            ["cp", "--archive", "--reflink=auto", source, destination],
+            check=True,
+        )
+    else:
+        shutil.copytree(source, destination, symlinks=True)
+
+
+class WorktreePool:
+    """A fixed number of project copies handed out to one worker at a time"""
+
+    def __init__(
+        self,
+        project_path: Path,
+        size: int,
+        *,
+        root: Path = None,
+        prepare: Optional[Callable[[Path], None]] = None,
+    ):
+        """
+        :param root: where the copies go, a directory of this process in `WORKTREES_DIR` if None,
+            so that concurrent runs of the same project don't share (or remove) their copies
+        :param prepare: called once on every new copy, before it's handed out
+        """
+        self.project_path = project_path
+        self.size = max(1, size)
+        self.prepare = prepare
+        if root is None:
+            root = settings.WORKTREES_DIR / f"pid-{os.getpid()}"
+        self.root = root / project_path.name
+        self._free: "queue.Queue[Path]" = queue.Queue()
+        self._created: List[Path] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "WorktreePool":
+        if self.root.exists():
+            shutil.rmtree(self.root)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+    @property
+    def worktrees(self) -> List[Path]:
+        """The copies made so far"""
+        with self._lock:
+            return list(self._created)
+
+    def _create(self, index: int) -> Path:
+        worktree = self.root / f"worker-{index}"
+        print(f"* * Creating worktree {worktree}")
+        copy_project(self.project_path, worktree)
+        if self.prepare is not None:
+            self.prepare(worktree)
+        return worktree
+
+    @contextmanager
+    def checkout(self) -> Iterator[Path]:
+        """Borrow a worktree for the duration of one run"""
+        try:
+            worktree = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                index = len(self._created) if len(self._created) < self.size else None
+                if index is not None:
+                    # reserved until it's copied
+                    self._created.append(self.root / f"worker-{index}")
+            if index is not None:
+                worktree = self._create(index)
+            else:
+                worktree = self._free.get()
+
+        try:
+            yield worktree
+        finally:
+            self._free.put(worktree)
+
+    def cleanup(self):
+        if self.root.exists():
+            shutil.rmtree(self.root)
+        if self.root.parent.name == f"pid-{os.getpid()}":
+            try:
+                self.root.parent.rmdir()
+            except OSError:
+                pass  # other projects of this process still use it
+        self._created = []
@@ -0,0 +1,145 @@
+"""What the pipeline reads from the POM files, parsed once per file.
+
+`PomModel.load` memoizes the models by path, and parses a file again
+only once its modification time or size changed, e.g. after the PIT plugin was added.
+Plugins and source directories a module doesn't declare come from its parent POM
+(`<parent><relativePath>`, `../pom.xml` by default) when the parent is part of the project tree.
+"""
+
+from __future__ import annotations
+
+import copy
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from effectiveness.pom_utils import ET, POM_NSMAP
+
+SUREFIRE_PLUGIN = 'maven-surefire-plugin'
+
+# maximum depth of the parent chain, in case of POMs that are their own ancestors
+MAX_PARENTS = 16
+
+_cache: Dict[Path, Tuple[Tuple[int, int], PomModel]] = {}
+_cache_lock = threading.Lock()
+
+
+def _clean_path(text: str) -> str:
+    # drop property references such as ${basedir}
+    return re.sub("[$@*}?].*[$@*}?]", "", text.strip())
+
+
+class PomModel:
+    def __init__(self, path: Path, tree: ET.ElementTree):
+        self.path = path
+        self.tree = tree
+
+    @classmethod
+    def load(cls, path: Path) -> PomModel:
+        path = Path(path).resolve()
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        with _cache_lock:
+            cached = _cache.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        model = cls(path, ET.parse(path))
+        with _cache_lock:
+            _cache[path] = (version, model)
+        return model
+
+    @property
+    def root(self) -> ET.Element:
+        return self.tree.getroot()
+
+    def copy_tree(self) -> ET.ElementTree:
+        """A copy of the document to modify, the cached one is shared"""
+        return copy.deepcopy(self.tree)
+
+    @property
+    def parent_path(self) -> Optional[Path]:
+        parent = self.root.find('pom:parent', POM_NSMAP)
+        if parent is None:
+            return None
+        relative_path = parent.findtext('pom:relativePath', '../pom.xml', POM_NSMAP).strip()
+        if not relative_path:
+            # an empty relativePath means the parent is only in a repository
+            return None
+        path = (self.path.parent / relative_path).resolve()
+        if path.is_dir():
+            path = path / 'pom.xml'
+        return path if path.is_file() and path != self.path else None
+
+    @property
+    def parent(self) -> Optional[PomModel]:
+        path = self.parent_path
+        return None if path is None else PomModel.load(path)
+
+    def lineage(self) -> List[PomModel]:
+        """This model and its ancestors, closest first"""
+        models = [self]
+        while len(models) < MAX_PARENTS:
+            parent = models[-1].parent
+            if parent is None or any(parent.path == model.path for model in models):
+                break
+            models.append(parent)
+        return models
+
+    def find_inherited(self, pattern: str) -> Optional[ET.Element]:
+        """First element matching `pattern` in this POM or, failing that, in its ancestors"""
+        for model in self.lineage():
+            element = model.root.find(pattern, POM_NSMAP)
+            if element is not None:
+                return element
+        return None
+
+    @property
+    def modules(self) -> List[str]:
+        return [
+            module.text.strip()
+            for module in self.root.findall('pom:modules/pom:module', POM_NSMAP)
+            if module.text
+        ]
+
+    @property
+    def plugins(self) -> List[ET.Element]:
+        """Plugins of the build, including the inherited ones not redeclared"""
+        plugins: Dict[str, ET.Element] = {}
+        for model in self.lineage():
+            for plugin in model.root.findall('pom:build/pom:plugins/pom:plugin', POM_NSMAP):
+                plugins.setdefault(plugin.findtext('pom:artifactId', '', POM_NSMAP), plugin)
+        return list(plugins.values())
+
+    def plugin(self, artifact_id: str) -> Optional[ET.Element]:
+        """A plugin declared anywhere (build, plugin management, profiles), inherited if missing"""
+        return self.find_inherited(f".//pom:plugin/[pom:artifactId='{artifact_id}']")
+
+    def _surefire_patterns(self, tag: str) -> List[str]:
+        surefire = self.plugin(SUREFIRE_PLUGIN)
+        if surefire is None:
+            return []
+        return [element.text for element in surefire.findall(f'.//pom:{tag}', POM_NSMAP)]
+
+    @property
+    def surefire_includes(self) -> List[str]:
+        return self._surefire_patterns('include')
+
+    @property
+    def surefire_excludes(self) -> List[str]:
+        return self._surefire_patterns('exclude')
+
+    def _build_directory(self, tag: str) -> Optional[str]:
+        element = self.find_inherited(f'.//pom:build/pom:{tag}')
+        if element is None or not element.text:
+            return None
+        return _clean_path(element.text)
+
+    @property
+    def source_directory(self) -> Optional[str]:
+        return self._build_directory('sourceDirectory')
+
+    @property
+    def test_source_directory(self) -> Optional[str]:
+        return self._build_directory('testSourceDirectory')
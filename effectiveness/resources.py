@@ -0,0 +1,84 @@
+"""Sharing the cores and the memory of the host between parallel stages.
+
+Every stage asks for an allotment instead of using all the cores on its own,
+so that nested or concurrent parallelism never adds up to more than the host has.
+The budget is the whole host, unless `CPU_BUDGET` and `MEMORY_BUDGET_GB` restrict it,
+e.g. when several processes of the pipeline share a node.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from effectiveness import settings
+
+GIB = 2**30
+
+
+@dataclass(frozen=True)
+class Allotment:
+    # concurrent jobs
+    workers: int
+    # threads (or processes) of every job
+    threads: int
+
+
+def cpu_budget() -> int:
+    if settings.CPU_BUDGET > 0:
+        return settings.CPU_BUDGET
+    try:
+        # cores this process may run on, less than the host has under taskset or in containers
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_budget() -> Optional[int]:
+    """Bytes available to the pipeline, None if unknown"""
+    if settings.MEMORY_BUDGET_GB > 0:
+        return int(settings.MEMORY_BUDGET_GB * GIB)
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def mutation_allotment(workers: Optional[int] = None) -> Allotment:
+    """Concurrent PIT runs and PIT threads of each run
+
+    Every run is a Maven JVM plus one minion JVM per thread,
+    so the number of runs is also bounded by the memory.
+
+    :param workers: requested concurrent runs, as many as 4 threads each allow if None
+    """
+    cpus = cpu_budget()
+    if workers is None:
+        workers = max(1, cpus // 4)
+    workers = max(1, min(workers, cpus))
+    threads = max(1, cpus // workers)
+
+    memory = memory_budget()
+    if memory is not None:
+        run_memory = (settings.MAVEN_MEMORY_GB + threads * settings.PIT_THREAD_MEMORY_GB) * GIB
+        workers = max(1, min(workers, int(memory // run_memory)))
+        # the cores of the runs left out go to the remaining ones, as far as their memory goes
+        thread_memory = memory / workers / GIB - settings.MAVEN_MEMORY_GB
+        threads = max(1, min(cpus // workers, int(thread_memory // settings.PIT_THREAD_MEMORY_GB)))
+
+    return Allotment(workers, threads)
+
+
+def nested_allotment(outer_tasks: int) -> Allotment:
+    """Jobs of an outer parallel loop and of the parallel loop inside each of them,
+    e.g. the outer and inner folds of a nested cross validation
+    """
+    cpus = cpu_budget()
+    workers = max(1, min(outer_tasks, cpus))
+    return Allotment(workers, max(1, cpus // workers))
@@ -3,6 +3,28 @@ import os
 
 MUTATION_TIMEOUT = 20 * 60  # 20m
 
+# timeout of a PIT run with a predicted duration: FACTOR * prediction + MARGIN, at most MAX
+MUTATION_TIMEOUT_FACTOR = 3
+MUTATION_TIMEOUT_MARGIN = 2 * 60  # 2m
+MUTATION_TIMEOUT_MAX = 60 * 60  # 1h
+
+# send Maven goals to the Maven Daemon (mvnd) when it's installed
+MAVEN_DAEMON = os.environ.get("MAVEN_DAEMON", "1") != "0"
+
+# lines of Maven output kept in memory, and written to the log of the runs that fail
+MAVEN_LOG_LINES = 2000
+
+# cores and memory (in GiB) the pipeline may use, 0 for the whole host, see `resources.py`
+CPU_BUDGET = int(os.environ.get("CPU_BUDGET", 0))
+MEMORY_BUDGET_GB = float(os.environ.get("MEMORY_BUDGET_GB", 0))
+
+# memory used by a Maven JVM and by every PIT minion, to bound the concurrent PIT runs
+MAVEN_MEMORY_GB = 1
+PIT_THREAD_MEMORY_GB = 0.5
+
+# maximum number of CUT/test pairs mutated at the same time, None to fit the CPU budget
+MUTATION_WORKERS = int(os.environ["MUTATION_WORKERS"]) if "MUTATION_WORKERS" in os.environ else None
+
 # the base dir of the project
 # all paths derived from this one will be absolute
 BASE_DIR = Path(__file__).absolute().parent.parent
@@ -54,10 +76,63 @@ RESULTS_DIR = BASE_DIR / 'results'
 
 SCAN_PROJECT_DIR = RESULTS_DIR / 'scan_project'
 
+# packages of the Java files seen by the scans, keyed on path, size and modification time
+JAVA_PACKAGE_CACHE = RESULTS_DIR / 'java_packages.sqlite'
+
 # the path that contains the mutation results
 MUTATION_RESULTS_DIR = RESULTS_DIR / 'mutation'
 
+# the path that contains mutation reports reused across runs, keyed on source contents
+MUTATION_CACHE_DIR = RESULTS_DIR / 'mutation_cache'
+
+# the path that contains the per-mutant kill matrices of the mutation runs
+KILL_MATRIX_DIR = RESULTS_DIR / 'kill_matrix'
+
+# the database recording the progress of mutation runs
+MUTATION_JOURNAL = RESULTS_DIR / 'mutation_journal.sqlite'
+
+# the path that contains the PIT history files, with the results of single mutants
+PIT_HISTORY_DIR = RESULTS_DIR / 'pit_history'
+
+# PIT history files not updated for this long are removed
+PIT_HISTORY_MAX_AGE = 90 * 24 * 60 * 60  # 90d
+
+# sampled mutation runs (run.py --sample) stop when the confidence interval is narrower than this
+SAMPLING_CI_WIDTH = 0.1
+SAMPLING_CONFIDENCE = 0.95
+# PIT runs of a sampled pair at most, each one mutates twice as many methods as the previous one
+SAMPLING_MAX_ROUNDS = 3
+
+# cost of a pair without any recorded duration in `run.py --plan`: seconds per unit of static cost
+# (CUT lines x test methods) when running all the operators, plus the start of Maven and PIT
+PLAN_SECONDS_PER_COST = 0.02
+PLAN_RUN_OVERHEAD = 20
+
+# resources used by every process of the mutation runs, one JSON object per line
+MUTATION_PROFILE = RESULTS_DIR / 'mutation_profile.jsonl'
+
+# the path that contains isolated copies of the projects used by mutation workers
+WORKTREES_DIR = BASE_DIR / 'worktrees'
+
+# the database of mutation jobs shared by the coordinator and the workers of distributed runs,
+# on storage reachable from every node (e.g. NFS)
+MUTATION_QUEUE = Path(os.environ.get("MUTATION_QUEUE", RESULTS_DIR / 'mutation_queue.sqlite'))
+
+# seconds a worker may go past the timeout of a job before the job is given to another worker
+MUTATION_LEASE_MARGIN = 10 * 60  # 10m
+
+# seconds between two renewals of the lease of a running job, well below the margin
+MUTATION_LEASE_RENEWAL = 60
+
+# number of times a job is handed out (distributed) or run (`run.py --resume`)
+# before it's given up on
+MUTATION_MAX_ATTEMPTS = 3
+
 PIT_VERSION = "1.3.2"
+# first PIT version with `fullMutationMatrix`, which lists every killing test of a mutant
+# in the kill matrix
+PIT_FULL_MATRIX_VERSION = "1.4.3"
+JACOCO_VERSION = "0.8.5"
 CHECKSTYLE_PLUGIN_VERSION = "3.1.2"
 
 # PIT operators (https://pitest.org/quickstart/mutators/)
@@ -1,5 +1,9 @@
+import fcntl
+import os
 import shutil
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 
 
 def clear_dir(path):
@@ -17,6 +21,37 @@ def remove_file_if_exists(path: Path):
         path.unlink()
 
 
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """Temporary path to write `path` to, renamed over it once the block completes
+
+    Readers see either the old file or the complete new one, never a partial write.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists() or tmp_path.is_symlink():
+            tmp_path.unlink()
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """Holds an exclusive lock on `path` for the block, across processes
+
+    The lock is taken on a `<name>.lock` file next to it, which stays in place,
+    so that the file itself can be replaced while locked, e.g. with `atomic_path`.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f"{path.name}.lock"), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def tuple_if_none(value, size):
     if value is None:
         return (None,) * size
@@ -39,5 +39,13 @@ in
     # empty array in the default case
     *) additional=() ;;
 esac
+# use the Maven Daemon when it's installed, unless MAVEN_DAEMON=0
+if [ "${MAVEN_DAEMON:-1}" != "0" ] && command -v mvnd > /dev/null;
+then
+    mvn=(mvnd --batch-mode)
+else
+    mvn=(mvn)
+fi
+
 # mvn clean install -DskipTests
-mvn -e --update-snapshots clean test -Dmaven.test.failure.ignore=true "${additional[@]}"
+"${mvn[@]}" -e --update-snapshots clean test -Dmaven.test.failure.ignore=true "${additional[@]}"